@@ -1,44 +1,75 @@
+import random
 import pygame
-from utils import random_artefact_position
-from settings import TILE_SIZE, GREEN
+from assets import frame_dict
+from utils import random_artefact_position, move_rect, SimState
+from settings import TILE_SIZE, GREEN, ARTEFACT_SAFE_TRIES, ARTEFACT_SAFE_FRAMES
 
-class Artefact:
-    def __init__(self, start_pos):
+class Artefact(SimState):
+    STATE_FIELDS = ("pos", "collected", "current_frame", "frame_timer")
+
+    def __init__(self, start_pos, rng=None):
         self.pos = start_pos
         self.collected = False
+        self.rng = rng  # Falls back to the module-level random when None
 
-        # Load sprite sheet and extract frames
-        self.sprite_sheet = pygame.image.load("assets/img/artefact.png").convert_alpha()
-        self.frames = []
-        for i in range(4):
-            frame = self.sprite_sheet.subsurface(pygame.Rect(i * 16, 0, 16, 16))
-            # Scale frame to TILE_SIZE if needed
-            if TILE_SIZE != 16:
-                frame = pygame.transform.scale(frame, (TILE_SIZE, TILE_SIZE))
-            self.frames.append(frame)
+        self.frame_count = 4
         self.current_frame = 0
         self.frame_timer = 0
         self.frame_delay = 8  # Change frame every 8 ticks
 
-    def draw(self, screen):
+        # Reused by check_collection every step
+        self.player_rect = pygame.Rect(0, 0, TILE_SIZE, TILE_SIZE)
+        self.rect = pygame.Rect(0, 0, TILE_SIZE, TILE_SIZE)
+
+    @property
+    def frames(self):
+        return self.frames_at(1.0)
+
+    def frames_at(self, render_scale):
+        # A single row, scaled to TILE_SIZE
+        return frame_dict("assets/img/artefact.png", 16, 16, ("spin",), {"spin": 0}, self.frame_count,
+                          (TILE_SIZE, TILE_SIZE), render_scale)["spin"]
+
+    def update(self):
         if not self.collected:
-            # Animate
+            # Animate once per simulation step, however often we draw
             self.frame_timer += 1
             if self.frame_timer >= self.frame_delay:
                 self.frame_timer = 0
-                self.current_frame = (self.current_frame + 1) % len(self.frames)
+                self.current_frame = (self.current_frame + 1) % self.frame_count
+
+    def draw(self, screen, render_scale=1.0):
+        if not self.collected:
             # Draw current frame
-            screen.blit(self.frames[self.current_frame], self.pos)
+            pos = self.pos if render_scale == 1.0 else self.pos * render_scale
+            return screen.blit(self.frames_at(render_scale)[self.current_frame], pos)
+        return None
 
     def check_collection(self, player_pos):
         if not self.collected:
-            player_rect = pygame.Rect(player_pos.x, player_pos.y, TILE_SIZE, TILE_SIZE)
-            artifact_rect = pygame.Rect(self.pos.x, self.pos.y, TILE_SIZE, TILE_SIZE)
+            player_rect = move_rect(self.player_rect, player_pos.x, player_pos.y)
+            artifact_rect = move_rect(self.rect, self.pos.x, self.pos.y)
             if player_rect.colliderect(artifact_rect):
                 self.collected = True
                 return True
         return False
 
-    def respawn(self):
-        self.pos = random_artefact_position(self.pos)
+    def respawn(self, free_cells=None, avoid=(), forecast=None):
+        """Moves to a random cell clear of echo paths, away from here and the positions in avoid.
+
+        If every cell is taken, or without free_cells, only distance from
+        the old position is checked. forecast, EchoManager.forecast_many,
+        then picks among ARTEFACT_SAFE_TRIES such cells the first no echo
+        reaches soon, or else the one reached last.
+        """
+        pos = None
+        if free_cells is not None:
+            pos = free_cells.sample(self.rng or random, (self.pos,) + tuple(avoid))
+        if pos is None and forecast is not None:
+            candidates = [random_artefact_position(self.pos, self.rng) for _ in range(ARTEFACT_SAFE_TRIES)]
+            steps = forecast([(int(c.x), int(c.y), TILE_SIZE, TILE_SIZE) for c in candidates],
+                             ARTEFACT_SAFE_FRAMES).tolist()
+            # -1 means no echo gets there in time
+            pos = candidates[steps.index(-1) if -1 in steps else steps.index(max(steps))]
+        self.pos = pos if pos is not None else random_artefact_position(self.pos, self.rng)
         self.collected = False
@@ -0,0 +1,162 @@
+"""Baked asset pack: sprite frames and sound effects stored ready to use.
+
+bake.py writes the pack; assets.frame_rows and assets.load_sound read it,
+so startup maps one file instead of decoding PNGs and WAVs and scaling
+frames. A pack is a header, a JSON index and the data blobs it points to:
+
+    HEADER   magic, version, flags, index length
+    index    sources: path -> sha1 of the file the pack was baked from
+             pixel_format: byte order of every frame, as convert_alpha() laid it out
+             mixer: (frequency, size, channels) the sounds' PCM is in
+             frames: frame_rows() key -> rows of frame offsets
+             sounds: path -> (offset, length)
+    blobs    raw frame pixels and PCM, each at a BLOB_ALIGN offset
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import pygame
+
+MAGIC = b"EDAP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")  # magic, version, flags, index length
+BLOB_ALIGN = 16
+
+# Surface masks -> tobytes/frombuffer format that keeps the pixels as they are
+PIXEL_FORMATS = {
+    (0xFF0000, 0xFF00, 0xFF, 0xFF000000): "BGRA",
+    (0xFF, 0xFF00, 0xFF0000, 0xFF000000): "RGBA",
+}
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def frame_key(key):
+    """frame_rows() cache key back from its JSON list form."""
+    path, frame_width, frame_height, row_ys, frames_per_row, size = key
+    return path, frame_width, frame_height, tuple(row_ys), frames_per_row, tuple(size)
+
+
+def pixel_format(surface):
+    return PIXEL_FORMATS.get(tuple(surface.get_masks()), "RGBA")
+
+
+def write_pack(path, frame_sets, sounds, mixer_format):
+    """Writes frame_sets (frame_rows() key -> rows of Surfaces) and sounds (path -> raw PCM).
+
+    Goes through a temporary file, so a running game never maps half a pack.
+    Returns the pack size in bytes.
+    """
+    blobs = []
+    offset = 0
+
+    def place(data):
+        nonlocal offset
+        offset = -(-offset // BLOB_ALIGN) * BLOB_ALIGN
+        blobs.append((offset, data))
+        offset += len(data)
+        return blobs[-1][0]
+
+    layout = None
+    frames = []
+    for key, rows in frame_sets.items():
+        offsets = []
+        for row in rows:
+            row_offsets = []
+            for frame in row:
+                layout = layout or pixel_format(frame)
+                row_offsets.append(place(pygame.image.tobytes(frame, layout)))
+            offsets.append(row_offsets)
+        frames.append({"key": key, "rows": offsets})
+    sound_entries = {sound_path: [place(data), len(data)] for sound_path, data in sounds.items()}
+
+    sources = sorted({key[0] for key in frame_sets} | set(sounds))
+    index = {
+        "sources": {source: file_digest(source) for source in sources},
+        "pixel_format": layout or "RGBA",
+        "mixer": list(mixer_format) if mixer_format else None,
+        "frames": frames,
+        "sounds": sound_entries,
+    }
+    index_bytes = json.dumps(index).encode()
+    data_start = -(-(HEADER.size + len(index_bytes)) // BLOB_ALIGN) * BLOB_ALIGN
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(index_bytes)))
+        f.write(index_bytes)
+        for blob_offset, data in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(data)
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+class AssetPack:
+    """A pack mapped into memory. Frames and sounds are built from slices of the mapping.
+
+    The mapping is copy-on-write, so Surfaces over it can't write through
+    to the file; frames are shared like frame_rows() results anyway.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, _, index_length = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} asset pack")
+        index = json.loads(self.mm[HEADER.size:HEADER.size + index_length])
+        self.view = memoryview(self.mm)
+        self.data_start = -(-(HEADER.size + index_length) // BLOB_ALIGN) * BLOB_ALIGN
+        self.sources = index["sources"]
+        self.pixel_format = index["pixel_format"]
+        self.mixer_format = tuple(index["mixer"]) if index["mixer"] else None
+        self.frames = {frame_key(entry["key"]): entry["rows"] for entry in index["frames"]}
+        self.sounds = index["sounds"]
+
+    def stale_sources(self):
+        """Sources changed since the bake. Missing ones don't count, the pack is all there is of them."""
+        return [path for path, digest in self.sources.items()
+                if os.path.exists(path) and file_digest(path) != digest]
+
+    def blob(self, offset, length):
+        start = self.data_start + offset
+        return self.view[start:start + length]
+
+    def frame_rows(self, key):
+        """Rows of frames baked for a frame_rows() key, or None if the pack doesn't have them."""
+        rows = self.frames.get(key)
+        if rows is None:
+            return None
+        size = key[5]
+        length = size[0] * size[1] * 4
+        return tuple([pygame.image.frombuffer(self.blob(offset, length), size, self.pixel_format)
+                      for offset in row] for row in rows)
+
+    def sound(self, path):
+        """The baked sound for path, or None if it isn't baked or the mixer runs another format."""
+        entry = self.sounds.get(path)
+        if entry is None or pygame.mixer.get_init() != self.mixer_format:
+            return None
+        return pygame.mixer.Sound(buffer=self.blob(*entry))
+
+
+def open_pack(path):
+    """The pack at path if there is a readable, up to date one, else None."""
+    try:
+        pack = AssetPack(path)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    stale = pack.stale_sources()
+    if stale:
+        print(f"{path} is out of date ({', '.join(stale)} changed since the bake), "
+              f"loading source files; rerun bake.py")
+        return None
+    return pack
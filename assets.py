@@ -0,0 +1,106 @@
+import pygame
+from settings import ASSET_PACK_PATH
+from asset_pack import open_pack
+
+# Process-wide caches, filled on first use and shared by every game
+_sheets = {}  # path -> converted sprite sheet
+_frame_rows = {}  # (path, frame size, row ys, frames per row, draw size) -> rows of frames
+_frame_dicts = {}  # frame_rows key plus directions and render scale -> direction -> frames
+_pack = None  # Baked AssetPack, opened on first use; False when there's no usable one
+
+
+def asset_pack():
+    """The baked asset pack, or None to decode source files."""
+    global _pack
+    if _pack is None:
+        _pack = (open_pack(ASSET_PACK_PATH) if ASSET_PACK_PATH else None) or False
+    return _pack or None
+
+
+def set_asset_pack(pack):
+    """Uses pack from now on; None always decodes the sources, as bake.py needs."""
+    global _pack
+    _pack = pack or False
+
+
+def load_sheet(path):
+    sheet = _sheets.get(path)
+    if sheet is None:
+        sheet = pygame.image.load(path).convert_alpha()
+        _sheets[path] = sheet
+    return sheet
+
+
+def frame_rows(path, frame_width, frame_height, row_ys, frames_per_row, size):
+    """Slices rows of frames out of a sprite sheet, scaled to size.
+
+    Frames that would fall outside the sheet are skipped. The result is
+    cached, so every caller asking for the same grid and size shares the
+    same Surfaces and must not draw onto them. Sets in the baked asset
+    pack are taken from it without touching the sheet.
+    """
+    size = tuple(size)
+    key = (path, frame_width, frame_height, tuple(row_ys), frames_per_row, size)
+    rows = _frame_rows.get(key)
+    if rows is None:
+        pack = asset_pack()
+        rows = pack.frame_rows(key) if pack else None
+        if rows is not None:
+            _frame_rows[key] = rows
+    if rows is None:
+        sheet = load_sheet(path)
+        sheet_width, sheet_height = sheet.get_size()
+        rows = []
+        for y in row_ys:
+            frames = []
+            for i in range(frames_per_row):
+                rect = pygame.Rect(i * frame_width, y, frame_width, frame_height)
+                if rect.right > sheet_width or rect.bottom > sheet_height:
+                    continue
+                frame = sheet.subsurface(rect)
+                if size != (frame_width, frame_height):
+                    frame = pygame.transform.scale(frame, size)
+                frames.append(frame)
+            rows.append(frames)
+        rows = tuple(rows)
+        _frame_rows[key] = rows
+    return rows
+
+
+def frame_dict(path, frame_width, frame_height, directions, row_map, frames_per_row, size, render_scale=1.0):
+    """direction -> frames for a sheet with one row per direction, drawn at size times render_scale.
+
+    Sprites call this when they draw rather than when they're created, so
+    sheets load on the first draw at each scale and headless runs, which
+    never draw, need no display. Cached, with frame_rows()'s sharing rules.
+    """
+    key = (path, frame_width, frame_height, tuple(row_map[d] for d in directions), frames_per_row, tuple(size),
+           tuple(directions), render_scale)
+    frames = _frame_dicts.get(key)
+    if frames is None:
+        rows = frame_rows(path, frame_width, frame_height, key[3], frames_per_row, scaled_size(size, render_scale))
+        frames = _frame_dicts[key] = dict(zip(directions, rows))
+    return frames
+
+
+def frame_sets():
+    """Every frame set loaded so far, by frame_rows() key."""
+    return dict(_frame_rows)
+
+
+def load_sound(path):
+    """A Sound for path, from the baked asset pack if it has it."""
+    pack = asset_pack()
+    sound = pack.sound(path) if pack else None
+    return sound if sound is not None else pygame.mixer.Sound(path)
+
+
+def scaled_size(size, scale):
+    """size drawn at a render scale, never below one pixel."""
+    return tuple(max(1, round(n * scale)) for n in size)
+
+
+def clear_cache():
+    _sheets.clear()
+    _frame_rows.clear()
+    _frame_dicts.clear()
@@ -0,0 +1,46 @@
+"""Bakes every sprite frame set and sound effect into the asset pack.
+
+    python bake.py
+    python bake.py --out /tmp/pack.edp
+
+Frame sets are sliced and scaled from their sheets once here, at every
+render scale, and stored as raw pixels in the layout convert_alpha() gives
+on this display; sound effects are stored as PCM in the mixer's format.
+The game then builds Surfaces and Sounds straight from the mapped pack.
+Rerun after changing anything under assets/: until then the game finds
+the pack stale and decodes the source files.
+"""
+import argparse
+import pygame
+import assets
+from asset_pack import write_pack
+from main import preload_sprites
+from settings import ASSET_PACK_PATH
+from sounds import SOUND_FILES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake Echo Dash sprites and sounds into one asset pack")
+    parser.add_argument("--out", default=ASSET_PACK_PATH or "assets/pack.edp", help="Pack file to write")
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    pygame.mixer.init()
+    # Bake from the sources, never from an older pack
+    assets.set_asset_pack(None)
+    assets.clear_cache()
+
+    # The same warm-up main runs, so the pack holds every set the game asks for
+    preload_sprites(screen)
+    frame_sets = assets.frame_sets()
+    sounds = {path: pygame.mixer.Sound(path).get_raw() for path in SOUND_FILES.values()}
+    size = write_pack(args.out, frame_sets, sounds, pygame.mixer.get_init())
+    frames = sum(len(row) for rows in frame_sets.values() for row in rows)
+    print(f"{args.out}: {len(frame_sets)} frame sets ({frames} frames), {len(sounds)} sounds, "
+          f"{size / 1024:.0f} KiB")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Frame pipeline benchmarks on synthetic sessions.
+
+    python bench.py --out bench.json
+    python bench.py --baseline bench.json   # exits 1 on a regression
+
+Runs under the dummy SDL video driver, so it works on machines without a
+display. Timings are in milliseconds per call. The forecast_many batches
+also have to fit in one 1 / SIM_FPS frame at p95, or the run exits 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from settings import WIDTH, HEIGHT, TILE_SIZE, FONT_SIZE, PLAYER_SPEED, SIM_FPS
+from trajectory import Trajectory
+from game import GameSession
+from crt import CRTFilter
+
+DEFAULT_ECHO_COUNTS = (10, 100, 500, 1000, 2000)
+DISTINCT_PATHS = 8  # Synthetic recordings shared round-robin between echoes
+# forecast_many batches as (rects, echoes, frames ahead); each has to fit in one frame
+FORECAST_CASES = ((200, 50, 600), (300, 200, 3000))
+FRAME_BUDGET_MS = 1000.0 / SIM_FPS
+
+
+def synthetic_path(rng, length):
+    """Player-like recording: straight runs at PLAYER_SPEED with pauses."""
+    path = Trajectory()
+    x = rng.uniform(0, WIDTH - 2 * TILE_SIZE)
+    y = rng.uniform(0, HEIGHT - 2 * TILE_SIZE)
+    dx = dy = 0.0
+    for i in range(length):
+        if i % 40 == 0:
+            dx = rng.choice((-PLAYER_SPEED, 0.0, PLAYER_SPEED))
+            dy = rng.choice((-PLAYER_SPEED, 0.0, PLAYER_SPEED))
+        x = max(0.0, min(WIDTH - 2 * TILE_SIZE, x + dx))
+        y = max(0.0, min(HEIGHT - 2 * TILE_SIZE, y + dy))
+        path.append((x, y))
+    return path
+
+
+def build_session(echo_count, path_length, seed=0):
+    rng = random.Random(seed)
+    session = GameSession(seed)
+    paths = [synthetic_path(rng, path_length) for _ in range(DISTINCT_PATHS)]
+    for i in range(echo_count):
+        path = paths[i % len(paths)]
+        session.echoes.add_echo(path, frame=rng.randrange(path.loop_length))
+    session.echoes.positions_dirty = True
+    return session
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000.0
+
+    return {
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "mean_ms": sum(ordered) / len(ordered) * 1000.0,
+        "samples": len(ordered),
+    }
+
+
+def time_calls(fn, frames, warmup=5):
+    for _ in range(warmup):
+        fn()
+    timer = time.perf_counter
+    samples = []
+    for _ in range(frames):
+        start = timer()
+        fn()
+        samples.append(timer() - start)
+    return percentiles(samples)
+
+
+def memory_per_echo(echo_count, path_length):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    session = build_session(echo_count, path_length)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {
+        "traced_bytes_per_echo": (after - before) / max(1, echo_count),
+        "pack_bytes_per_echo": session.echoes.echoes.nbytes() / max(1, echo_count),
+    }
+
+
+def run_benchmarks(echo_counts, path_length, long_path_length, frames):
+    from main import draw_game
+    from hud import HudLayer
+
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    hud = HudLayer(pygame.font.SysFont("consolas", FONT_SIZE))
+    results = {}
+    memory = {}
+
+    cases = [(n, path_length) for n in echo_counts]
+    if long_path_length:
+        cases.append((min(echo_counts), long_path_length))
+
+    for n, length in cases:
+        tag = f"n={n},len={length}"
+        session = build_session(n, length)
+        echoes = session.echoes
+        player_pos = session.player.pos
+
+        results[f"echo_update/{tag}"] = time_calls(lambda: echoes.update(player_pos), frames)
+
+        def collision():
+            echoes.positions_dirty = True  # Include the position gather, as after a real update
+            echoes.check_collision(player_pos)
+
+        results[f"check_collision/{tag}"] = time_calls(collision, frames)
+        results[f"echo_draw/{tag}"] = time_calls(lambda: echoes.draw(screen), frames)
+
+        crt_filter = CRTFilter()
+
+        def full_frame():
+            screen.fill((100, 100, 100))
+            session.step(0)
+            draw_game(screen, hud, session)
+            crt_filter.apply(screen)
+            pygame.display.flip()
+
+        results[f"full_frame/{tag}"] = time_calls(full_frame, frames)
+        memory[tag] = memory_per_echo(n, length)
+
+    for rect_count, n, horizon in FORECAST_CASES:
+        session = build_session(n, path_length)
+        echoes = session.echoes
+        rng = random.Random(rect_count)
+        rects = [(rng.randrange(WIDTH - TILE_SIZE), rng.randrange(HEIGHT - TILE_SIZE), TILE_SIZE, TILE_SIZE)
+                 for _ in range(rect_count)]
+
+        def forecast():
+            echoes.forecast_params = None  # Redone every frame, as after a real update
+            echoes.forecast_many(rects, horizon)
+
+        results[f"forecast_many/rects={rect_count},n={n},frames={horizon}"] = time_calls(forecast, frames)
+
+    crt_filter = CRTFilter()
+    results["crt_filter"] = time_calls(lambda: crt_filter.apply(screen), frames)
+    return results, memory
+
+
+def over_budget(results, budget_ms=FRAME_BUDGET_MS):
+    """(name, p95) of the forecast batches whose p95 doesn't fit in one frame."""
+    return [(name, stats["p95_ms"]) for name, stats in results.items()
+            if name.startswith("forecast_many/") and stats["p95_ms"] > budget_ms]
+
+
+def compare(report, baseline, tolerance, min_delta_ms=0.05):
+    """Returns the (name, old p95, new p95) entries that got slower than tolerance allows.
+
+    Slowdowns under min_delta_ms are ignored so timer noise on tiny
+    benchmarks doesn't count as a regression.
+    """
+    regressions = []
+    for name, stats in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        slower = stats["p95_ms"] - old["p95_ms"]
+        if stats["p95_ms"] > old["p95_ms"] * (1.0 + tolerance) and slower > min_delta_ms:
+            regressions.append((name, old["p95_ms"], stats["p95_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Echo Dash frame pipeline")
+    parser.add_argument("--echoes", default=",".join(map(str, DEFAULT_ECHO_COUNTS)),
+                        help="Comma separated echo counts")
+    parser.add_argument("--path-length", type=int, default=2000, help="Frames per synthetic recording")
+    parser.add_argument("--long-path-length", type=int, default=30000,
+                        help="Extra case with this recording length (0 to skip)")
+    parser.add_argument("--frames", type=int, default=120, help="Timed calls per benchmark")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed p95 slowdown (0.15 = 15%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Ignore p95 slowdowns smaller than this")
+    args = parser.parse_args()
+
+    pygame.init()
+    echo_counts = [int(n) for n in args.echoes.split(",") if n]
+    results, memory = run_benchmarks(echo_counts, args.path_length, args.long_path_length, args.frames)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "frames": args.frames,
+            "path_length": args.path_length,
+        },
+        "results": results,
+        "memory": memory,
+    }
+
+    for name, stats in results.items():
+        print(f"{name:45s} p50 {stats['p50_ms']:8.3f}  p95 {stats['p95_ms']:8.3f}  p99 {stats['p99_ms']:8.3f} ms")
+    for tag, mem in memory.items():
+        print(f"memory/{tag:38s} {mem['traced_bytes_per_echo']:10.0f} B/echo")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    for name, p95 in over_budget(results):
+        print(f"OVER BUDGET {name}: p95 {p95:.3f} ms > {FRAME_BUDGET_MS:.3f} ms")
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: p95 {old:.3f} -> {new:.3f} ms")
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
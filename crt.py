@@ -0,0 +1,91 @@
+import pygame
+from settings import CRT_BLOOM_QUALITY, CRT_BLOOM_INTERVAL
+
+BLOOM_PRESETS = ("off", "half", "quarter", "every_n")
+BLOOM_ALPHA = 40
+
+
+def build_crt_overlay(size):
+    """Builds the static part of the CRT effect: scanlines, tint and border."""
+    width, height = size
+    crt_overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+
+    # --- Scanlines ---
+    scanline_color = (0, 0, 0, 40)  # Semi-transparent black
+    scanline_spacing = 2
+    for y in range(0, height, scanline_spacing):
+        pygame.draw.line(crt_overlay, scanline_color, (0, y), (width, y))
+
+    # --- Color tint (subtle blue/green) ---
+    tint_color = (30, 60, 80, 25)
+    tint_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+    tint_surface.fill(tint_color)
+    crt_overlay.blit(tint_surface, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+
+    # --- Curved border (simulate barrel distortion) ---
+    border_color = (0, 0, 0, 60)
+    border_width = 24
+    pygame.draw.rect(crt_overlay, border_color, (0, 0, width, height), border_width, border_radius=60)
+    return crt_overlay
+
+
+class CRTFilter:
+    """CRT overlay with the static layer cached per screen size.
+
+    Only the bloom depends on the frame contents; how much of it we pay for
+    is picked with a quality preset (see BLOOM_PRESETS).
+    """
+
+    def __init__(self, bloom_quality=CRT_BLOOM_QUALITY, bloom_interval=CRT_BLOOM_INTERVAL):
+        self._overlays = {}  # (width, height) -> overlay surface
+        self._small = None
+        self._bloom = None
+        self.bloom_interval = max(1, bloom_interval)
+        self.frame = 0
+        self.set_bloom_quality(bloom_quality)
+
+    def set_bloom_quality(self, quality):
+        if quality not in BLOOM_PRESETS:
+            raise ValueError(f"Unknown bloom quality {quality!r}, expected one of {BLOOM_PRESETS}")
+        self.bloom_quality = quality
+        # Scratch surfaces depend on the preset, rebuild them on next use
+        self._small = None
+        self._bloom = None
+        self.frame = 0
+
+    def cycle_bloom_quality(self):
+        idx = BLOOM_PRESETS.index(self.bloom_quality)
+        self.set_bloom_quality(BLOOM_PRESETS[(idx + 1) % len(BLOOM_PRESETS)])
+        return self.bloom_quality
+
+    def overlay(self, size):
+        overlay = self._overlays.get(size)
+        if overlay is None:
+            overlay = build_crt_overlay(size)
+            self._overlays[size] = overlay
+        return overlay
+
+    def _update_bloom(self, screen):
+        width, height = screen.get_size()
+        divisor = 4 if self.bloom_quality == "quarter" else 2
+        small_size = (max(1, width // divisor), max(1, height // divisor))
+        if self._small is None or self._small.get_size() != small_size:
+            self._small = pygame.Surface(small_size, 0, screen)
+        if self._bloom is None or self._bloom.get_size() != (width, height):
+            self._bloom = pygame.Surface((width, height), 0, screen)
+            self._bloom.set_alpha(BLOOM_ALPHA)
+        # Scale into the reused scratch surfaces instead of allocating new ones
+        pygame.transform.smoothscale(screen, small_size, self._small)
+        pygame.transform.smoothscale(self._small, (width, height), self._bloom)
+
+    def apply(self, screen):
+        """Draws the CRT overlay with scanlines, tint and bloom onto screen."""
+        if self.bloom_quality != "off":
+            stale = self._bloom is None or self._bloom.get_size() != screen.get_size()
+            if self.bloom_quality != "every_n" or stale or self.frame % self.bloom_interval == 0:
+                self._update_bloom(screen)
+            screen.blit(self._bloom, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+        self.frame += 1
+
+        screen.blit(self.overlay(screen.get_size()), (0, 0))
+
@@ -1,10 +1,17 @@
+import numpy as np
 import pygame
-from collections import deque
-from settings import TILE_SIZE, WHITE, BLACK, RED, YELLOW, GOOD_ECHO_LAG_FRAMES
+from assets import frame_dict, scaled_size
+from settings import (TILE_SIZE, WHITE, BLACK, RED, YELLOW, GOOD_ECHO_LAG_FRAMES, ECHO_BUFFER_TIME,
+                      ECHO_PATH_MEMORY_BUDGET)
+from trajectory import Trajectory
+from spatial import SpatialHash
+from occupancy import FreeCellSampler, TileTrace
+from utils import move_rect, SimState
+from echo_pack import EchoPack, PreparedPath, DIRECTION_NAMES, SAMPLE_BYTES
+from forecast import PathForecast, ForecastIndex, first_steps
 
 class EnemySpriteManager:
     def __init__(self):
-        self.sprite_sheet = pygame.image.load("assets/img/enemy.png").convert_alpha()
         self.frame_width = 32
         self.frame_height = 32
         self.frames_per_row = 10
@@ -15,25 +22,23 @@ class EnemySpriteManager:
             "right": 64,
             "left": 96,
         }
-        self.animations = {}
-        scale = 2 
-        for dir_name in self.directions:
-            y = self.row_map[dir_name]
-            frames = []
-            for i in range(self.frames_per_row):
-                rect = pygame.Rect(i * self.frame_width, y, self.frame_width, self.frame_height)
-                frame = self.sprite_sheet.subsurface(rect)
-                frame = pygame.transform.scale(frame, (self.frame_width * scale, self.frame_height * scale))
-                frames.append(frame)
-            self.animations[dir_name] = frames
-
-    def get_frame(self, direction, frame_idx):
-        return self.animations[direction][frame_idx % self.frames_per_row]
+        self.scale = 2
+
+    @property
+    def animations(self):
+        return self.animations_at(1.0)
+
+    def animations_at(self, render_scale):
+        return frame_dict("assets/img/enemy.png", self.frame_width, self.frame_height, self.directions, self.row_map,
+                          self.frames_per_row, (self.frame_width * self.scale, self.frame_height * self.scale),
+                          render_scale)
+
+    def get_frame(self, direction, frame_idx, render_scale=1.0):
+        return self.animations_at(render_scale)[direction][frame_idx % self.frames_per_row]
 
 # --- Friend (Good Echo) Sprite Manager ---
 class FriendSpriteManager:
     def __init__(self):
-        self.sprite_sheet = pygame.image.load("assets/img/friend.png").convert_alpha()
         self.frame_width = 64
         self.frame_height = 64
         self.frames_per_row = 8  
@@ -44,40 +49,52 @@ class FriendSpriteManager:
             "right": 128,
             "up": 192,
         }
-        self.animations = {}
-        sheet_width, sheet_height = self.sprite_sheet.get_size()
-        scale = 2  
-        for dir_name in self.directions:
-            y = self.row_map[dir_name]
-            frames = []
-            for i in range(self.frames_per_row):
-                rect = pygame.Rect(i * self.frame_width, y, self.frame_width, self.frame_height)
-                # Only add frame if within bounds
-                if rect.right <= sheet_width and rect.bottom <= sheet_height:
-                    frame = self.sprite_sheet.subsurface(rect)
-                    frame = pygame.transform.scale(frame, (self.frame_width * scale, self.frame_height * scale))
-                    frames.append(frame)
-            self.animations[dir_name] = frames
-
-    def get_frame(self, direction, frame_idx):
-        return self.animations[direction][frame_idx % self.frames_per_row]
-
-def get_direction_from_path(path, idx):
-    # Returns "down", "up", "right", or "left" based on movement vector
-    if len(path) < 2:
-        return "down"
-    if idx == 0:
-        prev = path[0]
-        curr = path[1] if len(path) > 1 else path[0]
-    else:
-        prev = path[idx - 1]
-        curr = path[idx]
-    dx = curr.x - prev.x
-    dy = curr.y - prev.y
-    if abs(dx) > abs(dy):
-        return "right" if dx > 0 else "left"
-    else:
-        return "down" if dy > 0 else "up"
+        self.scale = 2
+
+    @property
+    def animations(self):
+        return self.animations_at(1.0)
+
+    def animations_at(self, render_scale):
+        # Only frames that lie within the sheet are kept
+        return frame_dict("assets/img/friend.png", self.frame_width, self.frame_height, self.directions, self.row_map,
+                          self.frames_per_row, (self.frame_width * self.scale, self.frame_height * self.scale),
+                          render_scale)
+
+    def get_frame(self, direction, frame_idx, render_scale=1.0):
+        return self.animations_at(render_scale)[direction][frame_idx % self.frames_per_row]
+
+class EchoBuffer:
+    """A recorded path flashing in place before it turns into an echo."""
+
+    __slots__ = ("path", "cells", "pos", "timer", "color_state", "color_timer")
+
+    def __init__(self, path, cells, pos, timer=ECHO_BUFFER_TIME):
+        self.path = path
+        self.cells = cells  # Artefact spawn cells claimed for the path
+        self.pos = pos
+        self.timer = timer
+        self.color_state = True
+        self.color_timer = 15
+
+
+def prepare_echo(path, encode, forecast):
+    """Worker job for a queued echo: (PreparedPath, PathForecast or None) for its path."""
+    prepared = PreparedPath(path, encode)
+    return prepared, PathForecast(prepared.xs, prepared.ys) if forecast else None
+
+class GoodEcho:
+    """A friendly echo hunting bad ones until its timer runs out."""
+
+    __slots__ = ("pos", "prev_pos", "timer", "speed", "target_idx", "direction")
+
+    def __init__(self, timer, speed):
+        self.pos = None  # Starts on the player at its first step
+        self.prev_pos = None  # Position before the last step, for render interpolation
+        self.timer = timer
+        self.speed = speed  # Pixels per frame
+        self.target_idx = None  # Index of the echo being hunted
+        self.direction = "down"
 
 def get_direction_from_vector(vec):
     dx, dy = vec.x, vec.y
@@ -86,23 +103,56 @@ def get_direction_from_vector(vec):
     else:
         return "down" if dy > 0 else "up"
 
-class EchoManager:
-    def __init__(self):
-        self.echoes = []
-        self.echo_frames = []
-        self.recording = []
+class EchoManager(SimState):
+    STATE_FIELDS = ("echoes", "echo_cells", "free_cells", "recording", "recording_trace", "echo_buffers", "good_echoes",
+                    "good_echo_current_duration", "good_echo_speed",
+                    "freeze_bad_echoes", "freeze_timer", "advanced_last_step", "kills",
+                    "enemy_anim_timer", "enemy_anim_frame", "friend_anim_timer", "friend_anim_frame")
+
+    def __init__(self, buffer_time=ECHO_BUFFER_TIME, good_echo_speed=3, memory_budget=ECHO_PATH_MEMORY_BUDGET,
+                 executor=None):
+        # Active echoes: packed trajectories plus one frame counter each,
+        # paths run-length encoded once memory_budget bytes are in use
+        self.echoes = EchoPack(memory_budget=memory_budget)
+        self.recording = Trajectory()
+        self.recording_trace = TileTrace()  # Tiles the recording touched, for claiming it in O(1)
 
         self.echo_buffers = []
+        self.buffer_time = buffer_time  # Frames a new echo flashes before it moves
+        # Queued paths are prepared on executor while they flash, one future
+        # per buffer; without one, or after a restore, at activation instead
+        self.executor = executor
+        self.buffer_jobs = []
+
+        # Artefact spawn cells clear of every echo path; echo_cells holds
+        # each active echo's claim, in pack order
+        self.free_cells = FreeCellSampler()
+        self.echo_cells = []
+
+        # Current positions and grid over them, refreshed lazily after echoes move
+        self.echo_xs = None
+        self.echo_ys = None
+        self.positions_dirty = True
+        self.grid = SpatialHash(TILE_SIZE)
+        self.grid_dirty = True
+
+        # Tile stretches of each echo's and buffer's path for forecast(),
+        # None until a forecast first needs them
+        self.echo_forecasts = []
+        self.buffer_forecasts = []
+        self.forecast_index = None
+        self.forecast_params = None
+        self.forecasting = False  # Set by the first forecast, so buffer jobs build them too
 
-        self.good_echo_active = False
-        self.good_echo_pos = None
-        self.good_echo_timer = 0
+        self.good_echoes = []  # Several can hunt at once, each on its own timer
         self.good_echo_current_duration = None
-        self.good_echo_target_idx = None  # Index of the echo being hunted
-        self.good_echo_speed = 3  # Pixels per frame, adjust as needed
+        self.good_echo_speed = good_echo_speed  # Pixels per frame for new good echoes
 
         self.freeze_bad_echoes = False
         self.freeze_timer = 0
+        self.advanced_last_step = False
+
+        self.kills = 0  # Bad echoes taken out by good echoes
 
         # --- Enemy sprite animation ---
         self.enemy_sprites = EnemySpriteManager()
@@ -115,72 +165,57 @@ class EchoManager:
         self.friend_anim_timer = 0
         self.friend_anim_delay = 6
         self.friend_anim_frame = 0
-        self.friend_last_direction = "down"
+
+        self.flash_tiles = None  # Buffer flash squares, built on first draw
+
+        # Scratch objects reused every step so the simulation doesn't allocate
+        self.heading = pygame.Vector2(0, 1)
+        self.step_vec = pygame.Vector2()
+        self.good_echo_rect = pygame.Rect(0, 0, TILE_SIZE, TILE_SIZE)
+        self.target_rect = pygame.Rect(0, 0, TILE_SIZE, TILE_SIZE)
+        self.claimed = set()  # Echo indices already targeted this step
+        self.killed = set()
 
         self.sounds = None  # Will be set from main
 
     def set_sounds(self, sounds):
         self.sounds = sounds
 
-    def start_good_echo(self, duration_base, duration_increment):
-        self.good_echo_active = True
+    def set_state(self, state):
+        super().set_state(state)
+        # Everything derived from the restored state is rebuilt on demand
+        self.positions_dirty = True
+        self.grid_dirty = True
+        self.echo_forecasts = [None] * len(self.echoes)
+        self.buffer_forecasts = [None] * len(self.echo_buffers)
+        self.buffer_jobs = [None] * len(self.echo_buffers)
+        self.forecast_index = None
+        self.forecast_params = None
+
+    @property
+    def good_echo_active(self):
+        return bool(self.good_echoes)
+
+    def start_good_echo(self, duration_base, duration_increment, speed=None):
+        """Adds a good echo; each one lasts duration_increment frames longer than the last."""
         if self.good_echo_current_duration is None:
             self.good_echo_current_duration = duration_base
-        self.good_echo_timer = self.good_echo_current_duration
+        self.good_echoes.append(GoodEcho(self.good_echo_current_duration, speed or self.good_echo_speed))
         self.good_echo_current_duration += duration_increment
-        self.good_echo_pos = None  # Will be set in update
-        self.good_echo_target_idx = None
 
     def freeze_bad(self, duration_frames):
         self.freeze_bad_echoes = True
         self.freeze_timer = duration_frames
+        self.forecast_params = None
 
-    def update(self, player_pos, screen):
+    def update(self, player_pos):
+        """Advances the simulation by one frame. Drawing happens in draw()."""
         # Append player pos to recording
-        self.recording.append(player_pos.copy())
-
-        # Good echo hunting logic
-        friend_direction_vec = pygame.Vector2(0, 1)  # Default down
-        if self.good_echo_active:
-            if self.good_echo_pos is None:
-                self.good_echo_pos = player_pos.copy()
-            # Find nearest bad echo to hunt
-            if self.echoes:
-                min_dist = float('inf')
-                target_idx = None
-                target_pos = None
-                for i, path in enumerate(self.echoes):
-                    if len(path) > 0:
-                        idx = self.echo_frames[i] % len(path)
-                        echo_pos = path[idx]
-                        dist = self.good_echo_pos.distance_to(echo_pos)
-                        if dist < min_dist:
-                            min_dist = dist
-                            target_idx = i
-                            target_pos = echo_pos
-                self.good_echo_target_idx = target_idx
-                # Move good echo towards target
-                if target_pos is not None:
-                    direction = (target_pos - self.good_echo_pos)
-                    if direction.length() > 0:
-                        friend_direction_vec = direction
-                        direction = direction.normalize()
-                        self.good_echo_pos += direction * self.good_echo_speed
-                    # Check collision with target echo
-                    good_echo_rect = pygame.Rect(self.good_echo_pos.x, self.good_echo_pos.y, TILE_SIZE, TILE_SIZE)
-                    echo_rect = pygame.Rect(target_pos.x, target_pos.y, TILE_SIZE, TILE_SIZE)
-                    if good_echo_rect.colliderect(echo_rect):
-                        # Play attack sound if available
-                        if self.sounds and "attack" in self.sounds:
-                            self.sounds["attack"].play()
-                        del self.echoes[target_idx]
-                        del self.echo_frames[target_idx]
-                        self.good_echo_target_idx = None
-            else:
-                self.good_echo_target_idx = None
-        else:
-            self.good_echo_pos = None
-            self.good_echo_target_idx = None
+        self.recording.append(player_pos)
+        self.recording_trace.add(*self.recording.last())
+
+        if self.good_echoes:
+            self.hunt(player_pos)
 
         # Handle freeze timer
         if self.freeze_bad_echoes:
@@ -188,24 +223,22 @@ class EchoManager:
             if self.freeze_timer <= 0:
                 self.freeze_bad_echoes = False
 
-        # Echo buffer flashing before spawning actual echo
-        new_buffers = []
-        for buffer in self.echo_buffers:
-            buffer['color_timer'] -= 1
-            if buffer['color_timer'] <= 0:
-                buffer['color_state'] = not buffer['color_state']
-                buffer['color_timer'] = 15
-
-            flash_color = WHITE if buffer['color_state'] else BLACK
-            pygame.draw.rect(screen, flash_color, (*buffer['pos'], TILE_SIZE, TILE_SIZE))
-
-            buffer['timer'] -= 1
-            if buffer['timer'] <= 0:
-                self.echoes.append(buffer['path'])
-                self.echo_frames.append(0)
+        # Echo buffer flashing before spawning actual echo, spawned ones are dropped in place
+        buffers = self.echo_buffers
+        i = 0
+        while i < len(buffers):
+            buffer = buffers[i]
+            buffer.color_timer -= 1
+            if buffer.color_timer <= 0:
+                buffer.color_state = not buffer.color_state
+                buffer.color_timer = 15
+
+            buffer.timer -= 1
+            if buffer.timer <= 0:
+                self.activate_buffer(i)
+                del buffers[i]
             else:
-                new_buffers.append(buffer)
-        self.echo_buffers = new_buffers
+                i += 1
 
         # --- Animate enemy (bad echo) frames ---
         if not self.freeze_bad_echoes:
@@ -220,66 +253,347 @@ class EchoManager:
             self.friend_anim_timer = 0
             self.friend_anim_frame = (self.friend_anim_frame + 1) % self.friend_sprites.frames_per_row
 
-        # Update and draw echoes
-        surviving_echoes = []
-        surviving_frames = []
-        for i in range(len(self.echoes)):
-            path = self.echoes[i]
-            if len(path) > 0:
-                index = self.echo_frames[i] % len(path)
-                echo_pos = path[index]
-
-                # --- Animated enemy sprite instead of rectangle ---
-                direction = get_direction_from_path(path, index)
-                frame_idx = self.enemy_anim_frame
-                frame = self.enemy_sprites.get_frame(direction, frame_idx)
-                # Center the 4x sprite on the echo position (TILE_SIZE square)
-                sprite_rect = frame.get_rect()
-                sprite_rect.center = (echo_pos.x + TILE_SIZE // 2, echo_pos.y + TILE_SIZE // 2)
-                screen.blit(frame, sprite_rect)
-
-                # Only advance frame if not frozen
-                if not self.freeze_bad_echoes:
-                    surviving_echoes.append(path)
-                    surviving_frames.append(self.echo_frames[i] + 1)
+        # Only advance frames if not frozen
+        self.echoes.advance(self.freeze_bad_echoes)
+        self.advanced_last_step = not self.freeze_bad_echoes
+        self.positions_dirty = True
+        self.forecast_params = None
+
+        # Good echo timer update, expired ones are dropped in place
+        friends = self.good_echoes
+        i = 0
+        while i < len(friends):
+            friends[i].timer -= 1
+            if friends[i].timer <= 0:
+                del friends[i]
+            else:
+                i += 1
+
+    def hunt(self, player_pos):
+        """Moves every good echo one step towards its target and applies kills.
+
+        Each good echo goes for the nearest bad echo no earlier good echo
+        has claimed this step, or the nearest overall once all are taken.
+        Kills are collected first and removed in descending index order, so
+        two good echoes landing on the same frame can't shift each other's
+        targets.
+        """
+        claimed = self.claimed
+        killed = self.killed
+        claimed.clear()
+        killed.clear()
+        if self.echoes:
+            self.refresh_grid()
+        grid = self.grid
+
+        for friend in self.good_echoes:
+            if friend.pos is None:
+                friend.prev_pos = None
+                friend.pos = player_pos.copy()
+            elif friend.prev_pos is None:
+                friend.prev_pos = friend.pos.copy()
+            else:
+                friend.prev_pos.update(friend.pos)
+
+            friend_direction_vec = self.heading
+            friend_direction_vec.update(0, 1)  # Default down
+            friend.target_idx = None
+            if self.echoes:
+                if len(claimed) < len(self.echoes):
+                    target_idx = grid.nearest(friend.pos, claimed)
                 else:
-                    surviving_echoes.append(path)
-                    surviving_frames.append(self.echo_frames[i])
-        self.echoes = surviving_echoes
-        self.echo_frames = surviving_frames
-
-        # Good echo timer update
-        if self.good_echo_active:
-            self.good_echo_timer -= 1
-            if self.good_echo_timer <= 0:
-                self.good_echo_active = False
-                self.good_echo_pos = None
-                self.good_echo_target_idx = None
-
-        # Draw good echo as animated sprite
-        if self.good_echo_active and self.good_echo_pos:
-            direction = get_direction_from_vector(friend_direction_vec)
-            self.friend_last_direction = direction
-            frame = self.friend_sprites.get_frame(direction, self.friend_anim_frame)
+                    target_idx = grid.nearest(friend.pos)  # More good echoes than bad ones
+                claimed.add(target_idx)
+                friend.target_idx = target_idx
+                target_x = grid.xs[target_idx]
+                target_y = grid.ys[target_idx]
+                # Move good echo towards target
+                direction = self.step_vec
+                direction.update(target_x, target_y)
+                direction -= friend.pos
+                if direction.length() > 0:
+                    friend_direction_vec.update(direction)
+                    direction.normalize_ip()
+                    direction *= friend.speed
+                    friend.pos += direction
+                # Check collision with target echo
+                good_echo_rect = move_rect(self.good_echo_rect, friend.pos.x, friend.pos.y)
+                echo_rect = move_rect(self.target_rect, target_x, target_y)
+                if good_echo_rect.colliderect(echo_rect):
+                    killed.add(target_idx)
+            if friend.pos:
+                friend.direction = get_direction_from_vector(friend_direction_vec)
+
+        if killed:
+            for target_idx in sorted(killed, reverse=True):
+                # Play attack sound if available
+                if self.sounds and "attack" in self.sounds:
+                    self.sounds["attack"].play()
+                self.echoes.remove(target_idx)
+                self.free_cells.release(self.echo_cells.pop(target_idx))
+                self.echo_forecasts.pop(target_idx)
+                grid.remove(target_idx)
+                self.kills += 1
+            self.positions_dirty = True
+            self.forecast_index = None
+            self.forecast_params = None
+            for friend in self.good_echoes:
+                if friend.target_idx in killed:
+                    friend.target_idx = None
+                elif friend.target_idx is not None:
+                    friend.target_idx -= sum(1 for idx in killed if idx < friend.target_idx)
+
+    def draw(self, screen, alpha=1.0, render_scale=1.0):
+        """Draws echoes alpha of the way from their previous step to the current one.
+
+        Positions and sprites are scaled by render_scale for a smaller
+        render target. Everything goes out in a single Surface.blits call.
+        Returns the rects that were drawn to.
+        """
+        batch = []
+        # Echo buffer flashing before spawning actual echo
+        for buffer in self.echo_buffers:
+            tile = self.flash_tile(buffer.color_state, render_scale)
+            batch.append((tile, (int(buffer.pos[0] * render_scale), int(buffer.pos[1] * render_scale))))
+
+        if self.echoes:
+            batch.extend(self.enemy_blits(alpha, render_scale))
+
+        # Draw good echoes as animated sprites
+        for friend in self.good_echoes:
+            if not friend.pos:
+                continue
+            pos = friend.pos
+            if friend.prev_pos is not None:
+                pos = friend.prev_pos.lerp(pos, alpha)
+            frame = self.friend_sprites.get_frame(friend.direction, self.friend_anim_frame, render_scale)
             sprite_rect = frame.get_rect()
-            sprite_rect.center = (self.good_echo_pos.x + TILE_SIZE // 2, self.good_echo_pos.y + TILE_SIZE // 2)
-            screen.blit(frame, sprite_rect)
-
-    def add_echo_buffer(self, loop_path, pos):
-        self.echo_buffers.append({
-            'path': loop_path,
-            'timer': 120,  # Could pass as param or use constant
-            'color_state': True,
-            'color_timer': 15,
-            'pos': pos
-        })
+            sprite_rect.center = ((pos.x + TILE_SIZE // 2) * render_scale, (pos.y + TILE_SIZE // 2) * render_scale)
+            batch.append((frame, sprite_rect))
+        return screen.blits(batch) if batch else []
+
+    def flash_tile(self, color_state, render_scale=1.0):
+        if self.flash_tiles is None:
+            self.flash_tiles = {}  # (color state, render scale) -> square
+        tile = self.flash_tiles.get((color_state, render_scale))
+        if tile is None:
+            tile = pygame.Surface(scaled_size((TILE_SIZE, TILE_SIZE), render_scale))
+            tile.fill(WHITE if color_state else BLACK)
+            self.flash_tiles[(color_state, render_scale)] = tile
+        return tile
+
+    def enemy_blits(self, alpha=1.0, render_scale=1.0):
+        """(frame, topleft) pairs for every visible echo sprite, in draw order.
+
+        Echoes showing the same frame at the same pixel are blitted once,
+        at the last one's place in the order so overlaps stack as before.
+        """
+        xs, ys = self.refresh_positions()
+        if alpha < 1.0 and self.advanced_last_step:
+            prev_xs, prev_ys = self.echoes.positions(-1)
+            xs = prev_xs + (xs - prev_xs) * alpha
+            ys = prev_ys + (ys - prev_ys) * alpha
+        directions = self.echoes.directions()
+        frames = [self.enemy_sprites.get_frame(name, self.enemy_anim_frame, render_scale) for name in DIRECTION_NAMES]
+        half_w = np.array([frame.get_width() // 2 for frame in frames])
+        half_h = np.array([frame.get_height() // 2 for frame in frames])
+
+        # Center each sprite on its tile, rounding like Rect.center does
+        cx = (xs.astype(np.float64) + TILE_SIZE // 2) * render_scale
+        cy = (ys.astype(np.float64) + TILE_SIZE // 2) * render_scale
+        left = np.trunc(cx + np.copysign(0.5, cx)).astype(np.int64) - half_w[directions]
+        top = np.trunc(cy + np.copysign(0.5, cy)).astype(np.int64) - half_h[directions]
+
+        key = (directions.astype(np.int64) << 42) | ((left + (1 << 20)) << 21) | (top + (1 << 20))
+        n = len(key)
+        _, first_from_end = np.unique(key[::-1], return_index=True)
+        keep = np.sort(n - 1 - first_from_end)
+        return [(frames[d], (x, y)) for d, x, y in
+                zip(directions[keep].tolist(), left[keep].tolist(), top[keep].tolist())]
+
+    def add_echo(self, path, frame=0, cells=None, forecast=None):
+        """Starts an echo walking path from loop frame, claiming its cells unless already claimed."""
+        self.echoes.add(path, frame)
+        self.echo_cells.append(self.free_cells.claim(path) if cells is None else cells)
+        self.echo_forecasts.append(forecast)
+        self.positions_dirty = True
+        self.forecast_index = None
+        self.forecast_params = None
+
+    def add_echo_buffer(self, loop_path, pos, cells=None):
+        """Queues loop_path to flash at pos for buffer_time steps, then walk as an echo.
+
+        The path is claimed now, so artefacts already avoid it while it
+        flashes; cells skips working out what to claim from its samples.
+        With an executor, the rest of the path's preparation runs there
+        meanwhile and the frame calling this does no per-sample work.
+        """
+        if cells is None:
+            cells = self.free_cells.path_cells(loop_path)
+        self.free_cells.claim_cells(cells)
+        job = None
+        if self.executor is not None:
+            # Encode up front if the path won't fit once the buffers ahead of it are in
+            queued = sum(len(buffer.path) for buffer in self.echo_buffers) + len(loop_path)
+            encode = self.echoes.live_bytes + queued * SAMPLE_BYTES > self.echoes.memory_budget
+            job = self.executor.submit(prepare_echo, loop_path, encode, self.forecasting)
+        self.echo_buffers.append(EchoBuffer(loop_path, cells, pos, self.buffer_time))
+        self.buffer_jobs.append(job)
+        self.buffer_forecasts.append(None)
+        self.forecast_index = None
+        self.forecast_params = None
+
+    def queue_recording(self):
+        """Queues the recording so far as an echo buffer and starts a new one.
+
+        Costs the same however long the recording is: its cells come from
+        the tile trace, and the samples are handed off without a copy.
+        """
+        path = self.recording
+        self.add_echo_buffer(path, path.xy_at(0), self.free_cells.trace_cells(self.recording_trace))
+        self.recording = Trajectory()
+        self.recording_trace = TileTrace()
+
+    def activate_buffer(self, i):
+        """Turns buffer i into an echo; the caller drops it from echo_buffers."""
+        buffer = self.echo_buffers[i]
+        job = self.buffer_jobs.pop(i)
+        forecast = self.buffer_forecasts.pop(i)
+        path = buffer.path
+        if job is not None:
+            # Done long before the flash ends in practice; waiting rather than
+            # flashing on keeps the spawn step the same as in a replay
+            path, prepared_forecast = job.result()
+            if forecast is None:
+                forecast = prepared_forecast
+        self.add_echo(path, cells=buffer.cells, forecast=forecast)
+
+    def trajectory_nbytes(self):
+        """Bytes held by echo paths: active echoes, queued buffers and the live recording."""
+        return (self.echoes.nbytes() + self.recording.nbytes()
+                + sum(buffer.path.nbytes() for buffer in self.echo_buffers))
+
+    def refresh_positions(self):
+        if self.positions_dirty:
+            self.echo_xs, self.echo_ys = self.echoes.positions()
+            self.positions_dirty = False
+            self.grid_dirty = True
+        return self.echo_xs, self.echo_ys
+
+    def refresh_grid(self):
+        xs, ys = self.refresh_positions()
+        if self.grid_dirty:
+            # Only echoes that crossed into another cell get re-bucketed
+            self.grid.sync(xs, ys)
+            self.grid_dirty = False
+
+    def forecast(self, rect, frames):
+        """Steps until an echo's box first overlaps rect, within the next frames steps, or None.
+
+        Step k is what check_collision would see after k more updates, with
+        frozen echoes staying put until the freeze wears off and buffered
+        paths joining once their timer runs out. Good echo kills and freezes
+        still to come are not foreseen.
+        """
+        step = int(self.forecast_many((rect,), frames)[0])
+        return step if step >= 0 else None
+
+    def forecast_many(self, rects, frames):
+        """forecast() for a batch of (x, y, w, h) rects, -1 where nothing hits.
+
+        Candidates come from the tile index over every path, so nothing gets
+        stepped, and the whole batch shares each array operation. Stretches
+        are timed as a whole first; only the partly overlapping ones that
+        could still beat the earliest full hit get checked box by box.
+        """
+        rects = np.array(rects, dtype=np.int64).reshape(-1, 4)
+        best = np.full(len(rects), -1, dtype=np.int64)
+        if not self.echoes and not self.echo_buffers:
+            return best
+        self.forecasting = True
+        if self.forecast_index is None:
+            # Each path's stretches are worked out once, the first time they're needed
+            forecasts = self.echo_forecasts
+            for i, forecast in enumerate(forecasts):
+                if forecast is None:
+                    forecasts[i] = PathForecast(*self.echoes.path_samples(i))
+            forecasts = self.buffer_forecasts
+            for i, forecast in enumerate(forecasts):
+                job = self.buffer_jobs[i]
+                if forecast is None and job is not None and job.done():
+                    forecast = forecasts[i] = job.result()[1]
+                if forecast is None:
+                    samples = np.frombuffer(self.echo_buffers[i].path.samples(), dtype=np.float32)
+                    forecasts[i] = PathForecast(samples[0::2], samples[1::2])
+            self.forecast_index = ForecastIndex(self.echo_forecasts + self.buffer_forecasts)
+        index = self.forecast_index
+        x, y, width, height = rects.T
+        queries, rows, full = index.stretches(x, y, width, height)
+        if not len(rows):
+            return best
+        if self.forecast_params is None:
+            self.forecast_params = self.forecast_entry_params()
+        counts, loop_frames, delays, first_step = self.forecast_params
+        # Exact for full stretches, and no later than any box of a partial one could hit
+        if len(rows) < len(index.keys):
+            steps = first_steps(index.starts[rows], index.stops[rows], index.entries[rows], counts, loop_frames,
+                                delays, first_step, frames)
+        else:
+            # Big batches see most stretches more than once, timing each once is cheaper
+            steps = first_steps(index.starts, index.stops, index.entries, counts, loop_frames, delays,
+                                first_step, frames)[rows]
+        never = np.iinfo(steps.dtype).max
+        earliest = np.full(len(rects), never, dtype=steps.dtype)
+        # Rows come grouped by rect, so each rect's earliest full hit is one segment of a reduceat
+        firsts = np.flatnonzero(np.diff(queries, prepend=-1))
+        earliest[queries[firsts]] = np.minimum.reduceat(np.where(full & (steps >= 0), steps, never), firsts)
+
+        # Only partial stretches that could still beat a full one get the exact box test
+        partial = np.flatnonzero(~full & (steps >= 0) & (steps < earliest[queries]))
+        if len(partial):
+            part_entries, samples, owners = index.samples(rows[partial])
+            part_queries = queries[partial][owners]
+            n = len(self.echoes)
+            active = part_entries < n
+            xs = np.empty(len(samples), dtype=np.float32)
+            ys = np.empty(len(samples), dtype=np.float32)
+            xs[active], ys[active] = self.echoes.sample_positions(part_entries[active], samples[active])
+            if not active.all():
+                for b in np.unique(part_entries[~active]).tolist():
+                    mine = part_entries == b
+                    path = np.frombuffer(self.echo_buffers[b - n].path.samples(), dtype=np.float32)
+                    xs[mine] = path[0::2][samples[mine]]
+                    ys[mine] = path[1::2][samples[mine]]
+            # Same box test as check_collision
+            ex = xs.astype(np.int64)
+            ey = ys.astype(np.int64)
+            qx, qy = x[part_queries], y[part_queries]
+            hits = np.flatnonzero((qx < ex + TILE_SIZE) & (ex < qx + width[part_queries]) &
+                                  (qy < ey + TILE_SIZE) & (ey < qy + height[part_queries]))
+            part_entries = part_entries[hits]
+            samples = samples[hits]
+            steps = first_steps(samples, samples + 1, part_entries, counts, loop_frames, delays,
+                                first_step, frames)
+            found = steps >= 0
+            np.minimum.at(earliest, part_queries[hits][found], steps[found])
+        best[earliest != never] = earliest[earliest != never]
+        return best
+
+    def forecast_entry_params(self):
+        """Per forecast entry: sample count, loop frame, steps held still and first step it can hit."""
+        n = len(self.echoes)
+        held = self.freeze_timer - 1 if self.freeze_bad_echoes else 0
+        # A buffer turns into an echo at frame 0 on the step its timer runs out
+        timers = np.array([buffer.timer for buffer in self.echo_buffers], dtype=np.int64)
+        counts = np.concatenate((self.echoes.counts[:n], [len(buffer.path) for buffer in self.echo_buffers]))
+        loop_frames = np.concatenate((self.echoes.frames[:n], np.zeros(len(timers), dtype=np.int64)))
+        delays = np.concatenate((np.full(n, held, dtype=np.int64), np.maximum(timers - 1, held)))
+        first_step = np.concatenate((np.ones(n, dtype=np.int64), timers))
+        return counts.astype(np.int64), loop_frames, delays, first_step
 
     def check_collision(self, player_pos):
-        player_rect = pygame.Rect(player_pos.x, player_pos.y, TILE_SIZE, TILE_SIZE)
-        for i, path in enumerate(self.echoes):
-            index = self.echo_frames[i] % len(path)
-            echo_pos = path[index]
-            echo_rect = pygame.Rect(echo_pos.x, echo_pos.y, TILE_SIZE, TILE_SIZE)
-            if player_rect.colliderect(echo_rect):
-                return i + 1  # round number or echo index
+        xs, ys = self.refresh_positions()
+        hit = self.echoes.first_hit(player_pos.x, player_pos.y, TILE_SIZE, xs, ys)
+        if hit is not None:
+            return hit + 1  # round number or echo index
         return None
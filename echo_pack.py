@@ -0,0 +1,391 @@
+import bisect
+import numpy as np
+from settings import ECHO_PATH_MEMORY_BUDGET
+
+# Facing codes returned by EchoPack.directions, same names the sprite managers use
+DIRECTION_NAMES = ("down", "up", "right", "left")
+DOWN, UP, RIGHT, LEFT = range(4)
+
+MIN_RUN = 4  # Shorter constant-velocity runs cost more as a segment than as literals
+SEGMENT_BYTES = 8 + 4 * 4 + 8  # Start key, x0/y0/dx/dy, literal offset
+SAMPLE_BYTES = 8
+
+
+def _grow(arr, needed):
+    if needed <= len(arr):
+        return arr
+    capacity = max(needed, 2 * len(arr))
+    grown = np.zeros(capacity, dtype=arr.dtype)
+    grown[:len(arr)] = arr
+    return grown
+
+
+def encode_runs(xs, ys, min_run=MIN_RUN):
+    """Splits a float32 path into constant-velocity runs and literal stretches.
+
+    Returns a list of (start, length, x0, y0, dx, dy) tuples, with x0 set to
+    None for literal stretches. A run is only kept as far as
+    x0 + float32(i) * dx rebuilds the recorded samples bit-for-bit, so
+    decoding is exact whatever rounding the recording went through.
+    """
+    n = len(xs)
+    if n == 0:
+        return []
+    dx = np.diff(xs)
+    dy = np.diff(ys)
+    # Sample j + 2 moved differently from sample j + 1
+    breaks = (np.flatnonzero((dx[1:] != dx[:-1]) | (dy[1:] != dy[:-1])) + 2).tolist()
+    x_bits = xs.view(np.uint32)
+    y_bits = ys.view(np.uint32)
+
+    segments = []
+    literal_start = None
+    s = 0
+    while s < n:
+        # A run from s lasts until the velocity changes
+        b = bisect.bisect_left(breaks, s + 2)
+        length = (breaks[b] if b < len(breaks) else n) - s
+        exact = 0
+        if length >= min_run:
+            step = np.arange(length, dtype=np.float32)
+            ok = ((xs[s] + step * dx[s]).view(np.uint32) == x_bits[s:s + length]) & \
+                 ((ys[s] + step * dy[s]).view(np.uint32) == y_bits[s:s + length])
+            exact = length if ok.all() else int(ok.argmin())
+        if exact >= min_run:
+            if literal_start is not None:
+                segments.append((literal_start, s - literal_start, None, None, None, None))
+                literal_start = None
+            segments.append((s, exact, xs[s], ys[s], dx[s], dy[s]))
+            s += exact
+        else:
+            if literal_start is None:
+                literal_start = s
+            s += max(1, exact) if length >= min_run else length
+    if literal_start is not None:
+        segments.append((literal_start, n - literal_start, None, None, None, None))
+    return segments
+
+
+def facing_table(xs, ys):
+    """Facing code for each frame of the ping-pong loop over a recorded path.
+
+    Frame k faces along the step that led to it (frame 0 along the first
+    step out). Frames where the path stands still keep the last facing,
+    wrapping around the loop, so idle echoes don't snap to one direction.
+    """
+    n = len(xs)
+    if n < 2:
+        return np.full(2 * n, DOWN, dtype=np.uint8)
+    out_dx = np.diff(xs)
+    out_dy = np.diff(ys)
+    zero = np.zeros(1, dtype=np.float32)
+    # Loop frames 0..n-1 walk out, n..2n-1 walk back; frame n repeats the last sample
+    dx = np.concatenate((out_dx[:1], out_dx, zero, -out_dx[::-1]))
+    dy = np.concatenate((out_dy[:1], out_dy, zero, -out_dy[::-1]))
+    codes = np.where(np.abs(dx) > np.abs(dy), np.where(dx > 0, RIGHT, LEFT), np.where(dy > 0, DOWN, UP))
+    moving = (dx != 0) | (dy != 0)
+    if not moving.any():
+        return np.full(2 * n, DOWN, dtype=np.uint8)
+    # Each frame takes the code of the latest moving frame, the loop's last one before the first
+    latest = np.maximum.accumulate(np.where(moving, np.arange(2 * n), -1))
+    latest[latest < 0] = np.flatnonzero(moving)[-1]
+    return codes[latest].astype(np.uint8)
+
+
+class PreparedPath:
+    """A recording worked up for EchoPack.add: its samples split into xs and
+    ys, its facing table and, if encode, its encode_runs() segments.
+
+    Reads nothing but the trajectory, so with copy it can be built on a
+    worker thread while the game keeps stepping.
+    """
+
+    __slots__ = ("xs", "ys", "facings", "segments")
+
+    def __init__(self, trajectory, encode=False, copy=True):
+        samples = np.frombuffer(trajectory.samples(), dtype=np.float32)
+        if copy:
+            samples = samples.copy()
+        self.xs = samples[0::2]
+        self.ys = samples[1::2]
+        self.facings = facing_table(self.xs, self.ys)
+        self.segments = encode_runs(self.xs, self.ys) if encode else None
+
+    def __len__(self):
+        return len(self.xs)
+
+
+class EchoPack:
+    """All active echo trajectories packed into shared NumPy arrays.
+
+    Each echo's recording is a list of segments: a constant-velocity run
+    (first sample and per-frame step) or a stretch of literal samples in the
+    lx/ly pool. Samples of every echo get consecutive keys, so a single
+    searchsorted over segment start keys finds the segment for every echo
+    at once, O(log segments) each. Stepping, position lookup and collision
+    are then single array operations over all echoes.
+
+    Recordings are stored as one literal stretch while the pack fits in
+    memory_budget bytes; past that, new echoes are run-length encoded.
+    Either way positions decode bit-for-bit.
+    """
+
+    def __init__(self, echo_capacity=64, segment_capacity=256, sample_capacity=4096,
+                 memory_budget=ECHO_PATH_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+
+        # Segment table, ordered by start key
+        self.seg_keys = np.zeros(segment_capacity, dtype=np.int64)
+        self.seg_x0 = np.zeros(segment_capacity, dtype=np.float32)
+        self.seg_y0 = np.zeros(segment_capacity, dtype=np.float32)
+        self.seg_dx = np.zeros(segment_capacity, dtype=np.float32)
+        self.seg_dy = np.zeros(segment_capacity, dtype=np.float32)
+        self.seg_lit = np.zeros(segment_capacity, dtype=np.int64)  # Literal pool offset, -1 for runs
+        self.n_segments = 0
+
+        # Literal sample pool
+        self.lx = np.zeros(sample_capacity, dtype=np.float32)
+        self.ly = np.zeros(sample_capacity, dtype=np.float32)
+        self.n_literals = 0
+
+        # Facing code per loop frame, echo with first key b owns [2 * b, 2 * b + 2 * count)
+        self.facings = np.zeros(2 * sample_capacity, dtype=np.uint8)
+
+        # Per echo: key of its first sample, sample count and loop frame counter
+        self.bases = np.zeros(echo_capacity, dtype=np.int64)
+        self.counts = np.zeros(echo_capacity, dtype=np.int64)
+        self.frames = np.zeros(echo_capacity, dtype=np.int64)
+        self.segment_ranges = []  # (first segment, segments, first literal, literals) per echo
+        self.n = 0
+        self.next_key = 0
+        self.live_bytes = 0
+
+    def __len__(self):
+        return self.n
+
+    def __getstate__(self):
+        # Only the live part of the tables, dead echoes are dropped from a
+        # compacted copy so taking a snapshot never changes the live pack
+        segments, lx, ly, facings, bases, segment_ranges, next_key = self._compacted(trim=True)
+        return {
+            "memory_budget": self.memory_budget,
+            "segments": segments,
+            "literals": (lx, ly),
+            "facings": facings,
+            "bases": bases,
+            "counts": self.counts[:self.n].copy(),
+            "frames": self.frames[:self.n].copy(),
+            "segment_ranges": segment_ranges,
+            "next_key": next_key,
+            "live_bytes": self.live_bytes,
+        }
+
+    def __setstate__(self, state):
+        self.memory_budget = state["memory_budget"]
+        (self.seg_keys, self.seg_x0, self.seg_y0, self.seg_dx, self.seg_dy, self.seg_lit) = state["segments"]
+        self.n_segments = len(self.seg_keys)
+        self.lx, self.ly = state["literals"]
+        self.n_literals = len(self.lx)
+        # Gathers index slot 0 even when nothing is stored, keep one
+        (self.seg_keys, self.seg_x0, self.seg_y0, self.seg_dx, self.seg_dy, self.seg_lit,
+         self.lx, self.ly) = (_grow(arr, 1) for arr in self._segment_arrays() + (self.lx, self.ly))
+        self.facings = _grow(state["facings"], 1)
+        self.bases = state["bases"]
+        self.counts = state["counts"]
+        self.frames = state["frames"]
+        self.segment_ranges = state["segment_ranges"]
+        self.n = len(self.bases)
+        self.next_key = state["next_key"]
+        self.live_bytes = state["live_bytes"]
+
+    def _segment_arrays(self):
+        return (self.seg_keys, self.seg_x0, self.seg_y0, self.seg_dx, self.seg_dy, self.seg_lit)
+
+    def nbytes(self):
+        return (sum(arr.nbytes for arr in self._segment_arrays()) + self.lx.nbytes + self.ly.nbytes
+                + self.facings.nbytes + self.bases.nbytes + self.counts.nbytes + self.frames.nbytes)
+
+    def add(self, path, frame=0, segments=None):
+        """Adds an echo walking path, a Trajectory or PreparedPath, starting at loop frame.
+
+        segments may be a precomputed encode_runs() result, as may a
+        PreparedPath's; otherwise the memory budget decides whether the
+        recording gets encoded.
+        """
+        if not isinstance(path, PreparedPath):
+            path = PreparedPath(path, copy=False)
+        count = len(path)
+        xs = path.xs
+        ys = path.ys
+        if segments is None:
+            segments = path.segments
+        if segments is None:
+            if self.live_bytes + count * SAMPLE_BYTES > self.memory_budget:
+                segments = encode_runs(xs, ys)
+            else:
+                segments = [(0, count, None, None, None, None)]
+
+        literal_total = sum(seg[1] for seg in segments if seg[2] is None)
+        full = (self.n_segments + len(segments) > len(self.seg_keys)
+                or self.n_literals + literal_total > len(self.lx))
+        if full and self._garbage_bytes() > self.live_bytes:
+            self.compact()
+
+        first_segment = self.n_segments
+        first_literal = self.n_literals
+        (self.seg_keys, self.seg_x0, self.seg_y0, self.seg_dx, self.seg_dy, self.seg_lit) = (
+            _grow(arr, first_segment + len(segments)) for arr in self._segment_arrays())
+        self.lx = _grow(self.lx, first_literal + literal_total)
+        self.ly = _grow(self.ly, first_literal + literal_total)
+
+        base = self.next_key
+        self.facings = _grow(self.facings, 2 * (base + count))
+        self.facings[2 * base:2 * (base + count)] = path.facings
+        seg = first_segment
+        lit = first_literal
+        for start, length, x0, y0, dx, dy in segments:
+            self.seg_keys[seg] = base + start
+            if x0 is None:
+                self.lx[lit:lit + length] = xs[start:start + length]
+                self.ly[lit:lit + length] = ys[start:start + length]
+                self.seg_lit[seg] = lit
+                lit += length
+            else:
+                self.seg_lit[seg] = -1
+                self.seg_x0[seg] = x0
+                self.seg_y0[seg] = y0
+                self.seg_dx[seg] = dx
+                self.seg_dy[seg] = dy
+            seg += 1
+        self.n_segments = seg
+        self.n_literals = lit
+
+        self.bases = _grow(self.bases, self.n + 1)
+        self.counts = _grow(self.counts, self.n + 1)
+        self.frames = _grow(self.frames, self.n + 1)
+        self.bases[self.n] = base
+        self.counts[self.n] = count
+        self.frames[self.n] = frame
+        self.segment_ranges.append((first_segment, len(segments), first_literal, literal_total))
+        self.n += 1
+        self.next_key += count
+        self.live_bytes += len(segments) * SEGMENT_BYTES + literal_total * SAMPLE_BYTES + 2 * count
+
+    def _garbage_bytes(self):
+        return self.n_segments * SEGMENT_BYTES + self.n_literals * SAMPLE_BYTES + 2 * self.next_key - self.live_bytes
+
+    def remove(self, i):
+        n = self.n
+        _, seg_count, _, lit_count = self.segment_ranges.pop(i)
+        self.live_bytes -= seg_count * SEGMENT_BYTES + lit_count * SAMPLE_BYTES + 2 * int(self.counts[i])
+        for arr in (self.bases, self.counts, self.frames):
+            arr[i:n - 1] = arr[i + 1:n]
+        self.n -= 1
+
+    def compact(self):
+        """Drops segments and literal samples of removed echoes."""
+        if self._garbage_bytes() == 0:
+            return
+        (segments, self.lx, self.ly, self.facings, self.bases[:self.n], self.segment_ranges,
+         self.next_key) = self._compacted()
+        (self.seg_keys, self.seg_x0, self.seg_y0, self.seg_dx, self.seg_dy, self.seg_lit) = segments
+        self.n_segments = sum(seg_count for _, seg_count, _, _ in self.segment_ranges)
+        self.n_literals = sum(lit_count for _, _, _, lit_count in self.segment_ranges)
+
+    def _compacted(self, trim=False):
+        """compact()'s tables as new arrays, leaving self as it is.
+
+        Returns (segment arrays, lx, ly, facings, bases, segment ranges,
+        next key). The arrays keep the current capacity, or with trim hold
+        just the live rows.
+        """
+        seg_total = sum(seg_count for _, seg_count, _, _ in self.segment_ranges)
+        lit_total = sum(lit_count for _, _, _, lit_count in self.segment_ranges)
+        key_total = int(self.counts[:self.n].sum())
+
+        def empty(arr, rows):
+            return np.zeros(rows if trim else len(arr), dtype=arr.dtype)
+
+        old_segments = self._segment_arrays()
+        new_segments = [empty(arr, seg_total) for arr in old_segments]
+        lx = empty(self.lx, lit_total)
+        ly = empty(self.ly, lit_total)
+        facings = empty(self.facings, 2 * key_total)
+        bases = self.bases[:self.n].copy()
+        segment_ranges = []
+        seg_used = lit_used = 0
+        next_key = 0
+        for i, (first_segment, seg_count, first_literal, lit_count) in enumerate(self.segment_ranges):
+            src = slice(first_segment, first_segment + seg_count)
+            dst = slice(seg_used, seg_used + seg_count)
+            for new, old in zip(new_segments, old_segments):
+                new[dst] = old[src]
+            # Renumber keys so they stay sorted and gapless
+            new_segments[0][dst] += next_key - self.bases[i]
+            literal = new_segments[5][dst]
+            literal[literal >= 0] += lit_used - first_literal
+            lx[lit_used:lit_used + lit_count] = self.lx[first_literal:first_literal + lit_count]
+            ly[lit_used:lit_used + lit_count] = self.ly[first_literal:first_literal + lit_count]
+            count = int(self.counts[i])
+            old_base = int(self.bases[i])
+            facings[2 * next_key:2 * (next_key + count)] = self.facings[2 * old_base:2 * (old_base + count)]
+            segment_ranges.append((seg_used, seg_count, lit_used, lit_count))
+            bases[i] = next_key
+            seg_used += seg_count
+            lit_used += lit_count
+            next_key += count
+        return tuple(new_segments), lx, ly, facings, bases, segment_ranges, next_key
+
+    def advance(self, frozen=False):
+        # In place, frozen echoes just keep their counters
+        if not frozen:
+            self.frames[:self.n] += 1
+
+    def _sample_keys(self, loop_frames):
+        # Ping-pong loop frame -> key of the recorded sample
+        counts = self.counts[:self.n]
+        k = loop_frames % (2 * counts)
+        return self.bases[:self.n] + np.where(k < counts, k, 2 * counts - 1 - k)
+
+    def _gather(self, keys):
+        seg = np.searchsorted(self.seg_keys[:self.n_segments], keys, side="right") - 1
+        rel = keys - self.seg_keys[seg]
+        lit = self.seg_lit[seg]
+        is_literal = lit >= 0
+        lit_idx = np.where(is_literal, lit + rel, 0)
+        step = rel.astype(np.float32)
+        xs = np.where(is_literal, self.lx[lit_idx], self.seg_x0[seg] + step * self.seg_dx[seg])
+        ys = np.where(is_literal, self.ly[lit_idx], self.seg_y0[seg] + step * self.seg_dy[seg])
+        return xs, ys
+
+    def positions(self, frame_offset=0):
+        """(xs, ys) of every echo frame_offset frames from now, gathered in one pass."""
+        frames = self.frames[:self.n]
+        return self._gather(self._sample_keys(frames + frame_offset if frame_offset else frames))
+
+    def path_samples(self, i):
+        """(xs, ys) of echo i's whole recording, in recorded order."""
+        return self._gather(self.bases[i] + np.arange(self.counts[i]))
+
+    def sample_positions(self, indices, samples):
+        """(xs, ys) of recorded sample samples[j] of echo indices[j]."""
+        return self._gather(self.bases[indices] + samples)
+
+    def directions(self):
+        """Facing code of every echo, looked up in the tables built by add()."""
+        counts = self.counts[:self.n]
+        return self.facings[2 * self.bases[:self.n] + self.frames[:self.n] % (2 * counts)]
+
+    def first_hit(self, x, y, size, xs=None, ys=None):
+        """Lowest echo index whose size x size box overlaps the box at (x, y), or None."""
+        if self.n == 0:
+            return None
+        if xs is None:
+            xs, ys = self.positions()
+        # Rects truncate towards zero, do the same before the strict overlap test
+        ix, iy = int(x), int(y)
+        ex = xs.astype(np.int64)
+        ey = ys.astype(np.int64)
+        hits = (ix < ex + size) & (ex < ix + size) & (iy < ey + size) & (ey < iy + size)
+        i = int(hits.argmax())
+        return i if hits[i] else None
@@ -0,0 +1,149 @@
+import numpy as np
+from settings import TILE_SIZE
+
+KEY_SPAN = 1 << 20  # Tile (tx, ty) is keyed as tx * KEY_SPAN + ty
+STRETCH_SAMPLES = 16  # Longest stretch, shorter ones have tighter bounds
+
+
+def tile_key(tx, ty):
+    return tx * KEY_SPAN + ty
+
+
+def path_stretches(xs, ys, size=TILE_SIZE):
+    """Each stretch a path's box spends with its corner on a tile, as (keys, starts, stops, bounds).
+
+    The box at sample s covers size x size pixels from its truncated
+    position, and is filed under the tile that position is on, so each
+    sample is in exactly one stretch. A stretch is a run of consecutive
+    samples [start, stop) on the same tile, cut every STRETCH_SAMPLES
+    samples; bounds holds the min x, max x, min y and max y of its
+    truncated positions.
+    """
+    ix = xs.astype(np.int64)
+    iy = ys.astype(np.int64)
+    keys = tile_key(ix // size, iy // size)
+    samples = np.arange(len(xs))
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    samples = samples[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]) | (samples[1:] != samples[:-1] + 1) | (samples[1:] % STRETCH_SAMPLES == 0)
+    starts = np.flatnonzero(first)
+    ends = np.append(starts[1:], len(keys)) - 1
+    sx = ix[samples].astype(np.int32)
+    sy = iy[samples].astype(np.int32)
+    if len(starts):
+        bounds = np.stack((np.minimum.reduceat(sx, starts), np.maximum.reduceat(sx, starts),
+                           np.minimum.reduceat(sy, starts), np.maximum.reduceat(sy, starts)))
+    else:
+        bounds = np.zeros((4, 0), dtype=np.int32)
+    return keys[starts], samples[starts].astype(np.int32), (samples[ends] + 1).astype(np.int32), bounds
+
+
+class PathForecast:
+    """Which tiles one echo path passes over, and during which samples.
+
+    Built from the recorded samples the first time a forecast needs it,
+    then kept for as long as the path is in play.
+    """
+
+    __slots__ = ("count", "keys", "starts", "stops", "bounds")
+
+    def __init__(self, xs, ys):
+        self.count = len(xs)
+        self.keys, self.starts, self.stops, self.bounds = path_stretches(xs, ys)
+
+
+def ranges(starts, lengths):
+    """Concatenated aranges [starts[i], starts[i] + lengths[i]), plus the i each value came from."""
+    owners = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(int(lengths.sum())) - np.repeat(offsets - starts, lengths), owners
+
+
+class ForecastIndex:
+    """Stretches of several paths merged into one table sorted by tile.
+
+    Entry e is the e-th forecast handed in. stretches() finds every
+    stretch on the tiles of a whole batch of rects with one searchsorted,
+    whatever the number of paths or rects.
+    """
+
+    def __init__(self, forecasts):
+        forecasts = list(forecasts)
+        if forecasts:
+            keys = np.concatenate([f.keys for f in forecasts])
+            entries = np.concatenate([np.full(len(f.keys), e, dtype=np.int64) for e, f in enumerate(forecasts)])
+            starts = np.concatenate([f.starts for f in forecasts])
+            stops = np.concatenate([f.stops for f in forecasts])
+            bounds = np.concatenate([f.bounds for f in forecasts], axis=1)
+        else:
+            keys = entries = starts = stops = np.zeros(0, dtype=np.int64)
+            bounds = np.zeros((4, 0), dtype=np.int32)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.entries = entries[order]
+        self.starts = starts[order]
+        self.stops = stops[order]
+        self.bounds = np.ascontiguousarray(bounds[:, order])
+
+    def stretches(self, x, y, width, height, size=TILE_SIZE):
+        """Stretches with a box that may overlap each rect, for int arrays of rects.
+
+        A box at truncated (ex, ey) overlaps the rect for ex in
+        (x - size, x + width) and the same for y, so the tiles searched are
+        those such corners can be on.
+
+        Returns (queries, rows, full): the rect and index row of each
+        candidate, and whether every box in the stretch overlaps that rect
+        (full) or only some of them might. Candidates come in rect order.
+        """
+        tx0, ty0 = (x - size + 1) // size, (y - size + 1) // size
+        tx1, ty1 = (x + width - 1) // size, (y + height - 1) // size
+        # The tiles down one column have consecutive keys, so each column is one run of rows
+        columns, owners = ranges(tx0, tx1 - tx0 + 1)
+        lo = np.searchsorted(self.keys, tile_key(columns, ty0[owners]), side="left")
+        hi = np.searchsorted(self.keys, tile_key(columns, ty1[owners]), side="right")
+        lengths = hi - lo
+        rows = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths - lo, lengths)
+        queries = np.repeat(owners, lengths)
+        # Open bounds on box corners, in the bounds' int32 so the comparisons don't widen
+        limits = np.stack((x - size, x + width, y - size, y + height)).astype(np.int32)
+        limits = np.repeat(limits[:, owners], lengths, axis=1)
+        left, right, top, bottom = limits
+        min_x, max_x, min_y, max_y = self.bounds[:, rows]
+        some = np.flatnonzero((max_x > left) & (min_x < right) & (max_y > top) & (min_y < bottom))
+        full = (min_x > left) & (max_x < right) & (min_y > top) & (max_y < bottom)
+        return queries[some], rows[some], full[some]
+
+    def samples(self, rows):
+        """(entries, samples, row positions) of every sample in the given stretches."""
+        samples, owners = ranges(self.starts[rows], self.stops[rows] - self.starts[rows])
+        return self.entries[rows][owners], samples, owners
+
+
+def first_steps(starts, stops, entries, counts, frames, delays, first_step, horizon):
+    """Earliest step each sample range [starts, stops) shows within horizon steps, -1 if none.
+
+    counts, frames, delays and first_step are per entry, and entries
+    gives each range's. An entry's loop frame after k steps is
+    frames + max(0, k - delays), from step first_step on, and it loops
+    over 2 * counts frames; samples [a, b) show at loop frames [a, b)
+    going out and [2n - b, 2n - a) coming back.
+    """
+    # Per entry: loop frame at first_step, frames it still moves by horizon and the step it moves from
+    period = 2 * counts
+    low = frames + np.maximum(0, first_step - delays)
+    slack = np.where(first_step <= horizon, np.maximum(0, horizon - delays) - (low - frames), -1)
+    moving = np.maximum(delays, first_step)
+    # Everything fits in int32 like starts and stops, which halves the traffic per range
+    phase, period, slack, moving, first_step = (v.astype(np.int32)[entries] for v in
+                                                (low % period, period, slack, moving, first_step))
+    best = np.full(len(starts), -1, dtype=np.int32)
+    for a, b in ((starts, stops), (period - stops, period - starts)):
+        # Frames to wait from low until the loop enters [a, b)
+        wait = a - phase
+        wait = np.where(wait > 0, wait, np.where(phase < b, 0, wait + period))
+        step = np.where(wait == 0, first_step, moving + wait)
+        best = np.where((wait <= slack) & ((best < 0) | (step < best)), step, best)
+    return best
@@ -0,0 +1,208 @@
+import random
+import pygame
+from settings import (TILE_SIZE, PLAYER_SPEED, DASH_SPEED, DASH_DURATION, DASH_COOLDOWN, ECHO_BUFFER_TIME,
+                      GOOD_ECHO_DURATION_BASE, GOOD_ECHO_DURATION_INCREMENT, ECHO_PATH_MEMORY_BUDGET)
+from player import Player
+from artefact import Artefact
+from echo import EchoManager
+from sounds import silent_sounds
+from profiler import NULL_PROFILER
+
+# One bit per control, so a frame of input fits in a byte
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_DASH = 16
+INPUT_FREEZE = 32
+INPUT_MASK_COUNT = 64
+
+_KEY_BITS = {
+    pygame.K_LEFT: INPUT_LEFT,
+    pygame.K_RIGHT: INPUT_RIGHT,
+    pygame.K_UP: INPUT_UP,
+    pygame.K_DOWN: INPUT_DOWN,
+    pygame.K_z: INPUT_DASH,
+    pygame.K_x: INPUT_FREEZE,
+}
+
+
+def input_mask_from_keys(keys):
+    mask = 0
+    for key, bit in _KEY_BITS.items():
+        if keys[key]:
+            mask |= bit
+    return mask
+
+
+class MaskKeys:
+    """Looks like pygame.key.get_pressed() for the keys Player reads."""
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        return bool(self.mask & _KEY_BITS.get(key, 0))
+
+
+# Every possible input state, built once so stepping never allocates one
+MASK_KEYS = tuple(MaskKeys(mask) for mask in range(INPUT_MASK_COUNT))
+
+
+# Knobs a session can override, e.g. from sweep.py; defaults are the shipped game
+DEFAULT_TUNING = {
+    "player_speed": PLAYER_SPEED,
+    "dash_speed": DASH_SPEED,
+    "dash_duration": DASH_DURATION,
+    "dash_cooldown": DASH_COOLDOWN,
+    "echo_buffer_time": ECHO_BUFFER_TIME,
+    "good_echo_duration_base": GOOD_ECHO_DURATION_BASE,
+    "good_echo_duration_increment": GOOD_ECHO_DURATION_INCREMENT,
+    "good_echo_speed": 3,
+    "good_echo_interval": 4,  # Rounds until the first good echo
+    "good_echo_interval_increment": 2,  # Added to the interval after each one
+    "freeze_cost": 3,  # Artefacts for the first freeze
+    "freeze_cost_increment": 1,
+    "freeze_duration": 180,  # 3 seconds at 60 FPS
+    "echo_path_memory_budget": ECHO_PATH_MEMORY_BUDGET,  # Bytes of raw paths before new ones get encoded
+}
+
+
+def tuning_with(overrides=None):
+    """DEFAULT_TUNING with overrides applied; unknown names raise KeyError."""
+    tuning = dict(DEFAULT_TUNING)
+    for name, value in (overrides or {}).items():
+        if name not in tuning:
+            raise KeyError(f"unknown tuning value {name!r}")
+        tuning[name] = value
+    return tuning
+
+
+class GameSession:
+    """Game rules for one run, with no rendering or frame pacing.
+
+    main drives it from the keyboard and draws its entities; headless runs
+    feed it input masks directly. An executor, such as main's worker
+    thread, prepares new echo paths off the stepping thread.
+    """
+
+    STATE_FIELDS = ("round_number", "artefact_count", "freeze_cost", "good_echo_spawn_interval",
+                    "good_echo_next_spawn", "frame", "round_start_frame", "round_stats", "game_over",
+                    "collision_round")
+
+    def __init__(self, seed=None, sounds=None, profiler=NULL_PROFILER, tuning=None, executor=None):
+        self.seed = seed
+        self.tuning = tuning = tuning_with(tuning)
+        self.rng = random.Random(seed)
+        self.sounds = sounds or silent_sounds()
+        self.profiler = profiler
+
+        self.player = Player(pygame.Vector2(5 * TILE_SIZE, 5 * TILE_SIZE), tuning["player_speed"],
+                             tuning["dash_speed"], tuning["dash_duration"], tuning["dash_cooldown"])
+        self.artefact = Artefact(pygame.Vector2(5 * TILE_SIZE, 8 * TILE_SIZE), self.rng)
+        self.echoes = EchoManager(tuning["echo_buffer_time"], tuning["good_echo_speed"],
+                                  tuning["echo_path_memory_budget"], executor)
+        self.echoes.set_sounds(self.sounds)
+
+        self.round_number = 1
+        self.artefact_count = 0
+        self.freeze_cost = tuning["freeze_cost"]
+
+        self.good_echo_spawn_interval = tuning["good_echo_interval"]  # Initial interval in rounds
+        self.good_echo_next_spawn = self.good_echo_spawn_interval
+
+        self.frame = 0
+        self.round_start_frame = 0
+        self.round_stats = []
+        self.game_over = False
+        self.collision_round = None
+
+    def step(self, mask):
+        """Runs one frame of input. Returns the collided echo's round, or None."""
+        player = self.player
+        echoes = self.echoes
+        profiler = self.profiler
+
+        move = player.handle_input(MASK_KEYS[mask])
+        player.update(move, mask & INPUT_DASH, self.sounds["dash"])
+
+        # Freeze ability: costs artefacts, cost increases after each use
+        if mask & INPUT_FREEZE and not echoes.freeze_bad_echoes and self.artefact_count >= self.freeze_cost:
+            self.artefact_count -= self.freeze_cost
+            echoes.freeze_bad(self.tuning["freeze_duration"])
+            self.freeze_cost += self.tuning["freeze_cost_increment"]
+        profiler.lap("player")
+
+        echoes.update(player.pos)
+        profiler.lap("echoes")
+
+        # Artefact logic
+        self.artefact.update()
+        if self.artefact.check_collection(player.pos):
+            self.collect()
+        profiler.lap("artefact")
+
+        self.frame += 1
+
+        # Check collisions with echoes
+        collision_round = echoes.check_collision(player.pos)
+        if collision_round is not None:
+            self.game_over = True
+            self.collision_round = collision_round
+        profiler.lap("collision")
+        return collision_round
+
+    def collect(self):
+        echoes = self.echoes
+        self.sounds["collect"].play()
+        # The recording is handed off as-is; echoes play it back and forth by index
+        echoes.queue_recording()
+        # Good echo spawns every good_echo_spawn_interval rounds, then the interval grows
+        if self.round_number == self.good_echo_next_spawn:
+            echoes.start_good_echo(self.tuning["good_echo_duration_base"], self.tuning["good_echo_duration_increment"])
+            self.good_echo_spawn_interval += self.tuning["good_echo_interval_increment"]
+            self.good_echo_next_spawn += self.good_echo_spawn_interval
+
+        self.round_stats.append({
+            "round": self.round_number,
+            "frames": self.frame + 1 - self.round_start_frame,
+            "echoes": len(echoes.echoes) + len(echoes.echo_buffers),
+            "kills": echoes.kills,
+        })
+        self.round_start_frame = self.frame + 1
+
+        self.round_number += 1
+        self.artefact.respawn(echoes.free_cells, (self.player.pos,), echoes.forecast_many)
+        self.artefact_count += 1  # Increment artefact count on collection
+
+    def snapshot(self):
+        """Full simulation state as plain data. Shares live objects, so pickle it before stepping again."""
+        state = {name: getattr(self, name) for name in self.STATE_FIELDS}
+        state["rng"] = self.rng.getstate()
+        state["player"] = self.player.get_state()
+        state["artefact"] = self.artefact.get_state()
+        state["echoes"] = self.echoes.get_state()
+        return state
+
+    def restore(self, state):
+        for name in self.STATE_FIELDS:
+            setattr(self, name, state[name])
+        self.rng.setstate(state["rng"])
+        self.player.set_state(state["player"])
+        self.artefact.set_state(state["artefact"])
+        self.echoes.set_state(state["echoes"])
+
+    def summary(self):
+        return {
+            "seed": self.seed,
+            "frames": self.frame,
+            "game_over": self.game_over,
+            "collision_round": self.collision_round,
+            "round_number": self.round_number,
+            "artefact_count": self.artefact_count,
+            "echoes": len(self.echoes.echoes),
+            "kills": self.echoes.kills,
+            "rounds": list(self.round_stats),
+        }
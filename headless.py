@@ -0,0 +1,169 @@
+"""Runs the game rules without a display, audio or frame limiting.
+
+    python headless.py --seed 1 --frames 100000
+"""
+import argparse
+import math
+import random
+import time
+from game import GameSession, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN, INPUT_DASH
+from player import PLAYER_DRAW_SIZE
+from settings import WIDTH, HEIGHT, TILE_SIZE
+from profiler import AllocationCounter
+
+# Stick directions a random walker can hold (no input, 4 straight, 4 diagonal)
+WALK_MASKS = (
+    0,
+    INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN,
+    INPUT_LEFT | INPUT_UP, INPUT_LEFT | INPUT_DOWN,
+    INPUT_RIGHT | INPUT_UP, INPUT_RIGHT | INPUT_DOWN,
+)
+
+
+def unit_step(mask):
+    """Direction a mask moves the player in, normalized like Player.handle_input."""
+    dx = bool(mask & INPUT_RIGHT) - bool(mask & INPUT_LEFT)
+    dy = bool(mask & INPUT_DOWN) - bool(mask & INPUT_UP)
+    length = math.hypot(dx, dy) or 1.0
+    return dx / length, dy / length
+
+
+WALK_STEPS = tuple(unit_step(mask) for mask in WALK_MASKS)
+DODGE_HORIZON = 45  # Steps ahead the dodging bot checks a move against echoes
+
+
+def random_walk_inputs(seed, hold_frames=30, dash_chance=0.05):
+    """Endless input script that holds a random direction for hold_frames at a time."""
+    rng = random.Random(seed)
+    while True:
+        mask = rng.choice(WALK_MASKS)
+        if rng.random() < dash_chance:
+            mask |= INPUT_DASH
+        for _ in range(hold_frames):
+            yield mask
+
+
+def seek_artefact(session):
+    """Input callback that walks straight at the artefact."""
+    player_pos = session.player.pos
+    target = session.artefact.pos
+    mask = 0
+    if target.x < player_pos.x - 1:
+        mask |= INPUT_LEFT
+    elif target.x > player_pos.x + 1:
+        mask |= INPUT_RIGHT
+    if target.y < player_pos.y - 1:
+        mask |= INPUT_UP
+    elif target.y > player_pos.y + 1:
+        mask |= INPUT_DOWN
+    return mask
+
+
+def dodge_echoes(session, horizon=DODGE_HORIZON):
+    """Input callback that walks at the artefact along moves no echo reaches soon.
+
+    Every walking move is checked at once with EchoManager.forecast_many,
+    assuming the player stops after it. The closest safe move wins; with
+    none safe, the one that stays clear longest.
+    """
+    player = session.player
+    target = session.artefact.pos
+    speed = player.speed
+    rects = []
+    for dx, dy in WALK_STEPS:
+        x = max(0, min(WIDTH - PLAYER_DRAW_SIZE, player.pos.x + dx * speed))
+        y = max(0, min(HEIGHT - PLAYER_DRAW_SIZE, player.pos.y + dy * speed))
+        rects.append((int(x), int(y), TILE_SIZE, TILE_SIZE))
+    steps = session.echoes.forecast_many(rects, horizon).tolist()
+    best_mask = 0
+    best_key = None
+    for mask, (x, y, _, _), step in zip(WALK_MASKS, rects, steps):
+        key = (horizon + 1 if step < 0 else step, -math.hypot(target.x - x, target.y - y))
+        if best_key is None or key > best_key:
+            best_mask = mask
+            best_key = key
+    return best_mask
+
+
+def simulate(seed, inputs, max_frames=None, session=None, recorder=None, allocations=None, step_times=None):
+    """Steps a GameSession until game over, the inputs run out or max_frames.
+
+    inputs is either an iterable of input masks or a callable taking the
+    session and returning the next mask (None to stop). Pass a
+    replay.ReplayRecorder to capture the run, or a
+    profiler.AllocationCounter to measure every step except those that end
+    a round. step_times, if given, gets each step's duration in ms appended.
+    Returns the session summary: final state plus per-round stats.
+    """
+    session = session or GameSession(seed)
+    if callable(inputs):
+        next_mask = inputs
+    else:
+        script = iter(inputs)
+        next_mask = lambda _session: next(script, None)
+
+    while not session.game_over and (max_frames is None or session.frame < max_frames):
+        mask = next_mask(session)
+        if mask is None:
+            break
+        if recorder is not None:
+            recorder.record(session, mask)
+        if step_times is not None:
+            start = time.perf_counter()
+            session.step(mask)
+            step_times.append((time.perf_counter() - start) * 1000.0)
+            continue
+        if allocations is None:
+            session.step(mask)
+            continue
+        round_number = session.round_number
+        allocations.start()
+        session.step(mask)
+        allocations.stop(record=session.round_number == round_number)
+    return session.summary()
+
+
+BOTS = ("seek", "dodge", "walk")
+
+
+def bot_inputs(bot, seed):
+    """Inputs for simulate() from a --bot name."""
+    if bot == "seek":
+        return seek_artefact
+    if bot == "dodge":
+        return dodge_echoes
+    return random_walk_inputs(seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless Echo Dash simulations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--frames", type=int, default=60 * 60 * 10, help="Frame cap per run")
+    parser.add_argument("--bot", choices=BOTS, default="seek",
+                        help="seek walks to each artefact, dodge does too but steers clear of echoes, "
+                             "walk wanders randomly")
+    parser.add_argument("--allocations", action="store_true",
+                        help="Count what each step allocates (slow, uses tracemalloc)")
+    args = parser.parse_args()
+
+    total_frames = 0
+    total_rounds = 0
+    allocations = AllocationCounter() if args.allocations else None
+    start = time.perf_counter()
+    for run in range(args.runs):
+        seed = args.seed + run
+        result = simulate(seed, bot_inputs(args.bot, seed), args.frames, allocations=allocations)
+        total_frames += result["frames"]
+        total_rounds += len(result["rounds"])
+        print(f"seed {seed}: {result['frames']} frames, round {result['round_number']}, "
+              f"echoes {result['echoes']}, kills {result['kills']}, game over {result['game_over']}")
+    elapsed = time.perf_counter() - start
+    print(f"{total_frames} frames / {total_rounds} rounds in {elapsed:.2f}s "
+          f"({total_frames / max(elapsed, 1e-9):.0f} frames/s, {total_rounds / max(elapsed, 1e-9):.1f} rounds/s)")
+    if allocations is not None:
+        print(f"allocations: {allocations.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from settings import WHITE, GREEN, BLUE, YELLOW, HUD_TEXT_CACHE_SIZE
+
+HUD_ORIGIN = (10, 10)
+HUD_LINE_HEIGHT = 20
+
+
+class TextCache:
+    """Rendered text Surfaces, least recently used dropped past capacity.
+
+    Keyed on (font, text, color), so callers must not draw onto what they
+    get back. renders counts actual rasterizations, for checking that a
+    steady frame does none.
+    """
+
+    def __init__(self, capacity=HUD_TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+        self.renders = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.renders += 1
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Shared by the menu, the HUD and the game over screen
+text_cache = TextCache()
+
+
+def hud_values(session):
+    """Everything the HUD shows, as a tuple that only changes when the HUD does."""
+    player = session.player
+    echoes = session.echoes
+    dash_wait = player.dash_cooldown_timer // 60 if player.dash_cooldown_timer else -1  # -1 reads "Ready"
+    return (session.round_number, dash_wait, session.artefact_count, session.freeze_cost,
+            len(echoes.good_echoes), echoes.freeze_bad_echoes)
+
+
+def hud_lines(values):
+    """(text, color) per HUD line, top to bottom."""
+    round_number, dash_wait, artefact_count, freeze_cost, friends, frozen = values
+    lines = [
+        (f"Round: {round_number}", WHITE),
+        (f"Dash: {'Ready' if dash_wait < 0 else f'Wait ({dash_wait}s)'}", WHITE),
+        (f"Gems: {artefact_count}", GREEN),
+        (f"Freeze Cost: {freeze_cost}", BLUE),
+    ]
+    if friends:
+        lines.append(("Good Echo Active!" if friends == 1 else f"{friends} Good Echoes Active!", YELLOW))
+    if frozen:
+        lines.append(("Freeze Active!", BLUE))
+    return lines
+
+
+class HudLayer:
+    """Top layer of the game screen, drawn over the world every frame.
+
+    Its blit list is rebuilt from the text cache only when one of the
+    bound values in hud_values() changes; any other frame just replays it.
+    """
+
+    def __init__(self, font, cache=text_cache):
+        self.font = font
+        self.cache = cache
+        self.values = None
+        self.blits = []
+        self.rebuilds = 0
+
+    def reset(self):
+        """Forces a rebuild on the next draw, e.g. for a new game."""
+        self.values = None
+
+    def update(self, session):
+        values = hud_values(session)
+        if values == self.values:
+            return False
+        self.values = values
+        x, y = HUD_ORIGIN
+        self.blits = [(self.cache.render(self.font, text, color), (x, y + i * HUD_LINE_HEIGHT))
+                      for i, (text, color) in enumerate(hud_lines(values))]
+        self.rebuilds += 1
+        return True
+
+    def draw(self, screen, session):
+        """Brings the layer up to date and draws it, returning the rects drawn to."""
+        self.update(session)
+        return screen.blits(self.blits)
@@ -1,69 +1,168 @@
+import time
+STARTUP_BEGIN = time.perf_counter()  # Before the heavy imports, for the startup report
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
 import pygame
 from settings import *
-from player import Player
-from artefact import Artefact
-from echo import EchoManager
+from game import GameSession, input_mask_from_keys
 from sounds import load_sounds
+from crt import CRTFilter
+from assets import frame_rows
+from profiler import FrameProfiler
+from render import DirtyRectRenderer
+from replay import ReplayRecorder
+from preload import AssetPreloader, StartupTimer
+from hud import HudLayer, text_cache
+from resolution import ResolutionScaler
 
 def draw_menu(screen, font, selected_idx, options, sfx_on, music_on):
     screen.fill(GRAY)
-    title = font.render("Echo Dash", True, YELLOW)
+    title = text_cache.render(font, "Echo Dash", YELLOW)
     screen.blit(title, (WIDTH // 2 - title.get_width() // 2, HEIGHT // 4))
     for i, option in enumerate(options):
         color = WHITE if i == selected_idx else BLUE
-        text = font.render(option, True, color)
+        text = text_cache.render(font, option, color)
         screen.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 + i * 40))
     # Show SFX/Music status
-    sfx_text = font.render(f"SFX: {'On' if sfx_on else 'Off'}", True, WHITE)
-    music_text = font.render(f"Music: {'On' if music_on else 'Off'}", True, WHITE)
+    sfx_text = text_cache.render(font, f"SFX: {'On' if sfx_on else 'Off'}", WHITE)
+    music_text = text_cache.render(font, f"Music: {'On' if music_on else 'Off'}", WHITE)
     screen.blit(sfx_text, (WIDTH // 2 - sfx_text.get_width() // 2, HEIGHT // 2 + len(options) * 40 + 20))
     screen.blit(music_text, (WIDTH // 2 - music_text.get_width() // 2, HEIGHT // 2 + len(options) * 40 + 50))
     pygame.display.flip()
 
-def menu_loop(screen, font, sfx_on, music_on):
+def draw_world(screen, session, alpha=1.0, render_scale=1.0):
+    """Draws the world layer at render_scale, returning the rects that were drawn to."""
+    # alpha: how far between the last two simulation steps to draw moving entities
+    drawn = session.echoes.draw(screen, alpha, render_scale)
+    drawn.append(session.artefact.draw(screen, render_scale))
+    drawn.append(session.player.draw(screen, alpha, render_scale))
+    session.profiler.lap("world")
+    return drawn
+
+def draw_game(screen, hud, session, alpha=1.0):
+    """Draws the world and HUD layers, returning the rects that were drawn to.
+
+    The background layer underneath is restored by the DirtyRectRenderer.
+    """
+    drawn = draw_world(screen, session, alpha)
+    drawn.extend(hud.draw(screen, session))
+    session.profiler.lap("hud")
+    return drawn
+
+def menu_loop(screen, font, sfx_on, music_on, on_shown=None, on_idle=None):
     options = ["Start Game", "Toggle SFX", "Toggle Music", "Quit"]
     selected_idx = 0
+    needs_draw = True
     while True:
-        draw_menu(screen, font, selected_idx, options, sfx_on, music_on)
-        for event in pygame.event.get():
+        # Only redraw when something on screen changed
+        if needs_draw:
+            draw_menu(screen, font, selected_idx, options, sfx_on, music_on)
+            needs_draw = False
+            if on_shown is not None:
+                on_shown()
+                on_shown = None
+        if on_idle is not None:
+            on_idle(music_on)
+        # Sleep until there is input, then handle everything queued with it
+        events = [pygame.event.wait(MENU_EVENT_TIMEOUT_MS)] + pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 return "quit", sfx_on, music_on
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                needs_draw = True
             if event.type == pygame.KEYDOWN:
                 if event.key in [pygame.K_UP, pygame.K_w]:
                     selected_idx = (selected_idx - 1) % len(options)
+                    needs_draw = True
                 elif event.key in [pygame.K_DOWN, pygame.K_s]:
                     selected_idx = (selected_idx + 1) % len(options)
+                    needs_draw = True
                 elif event.key in [pygame.K_RETURN, pygame.K_SPACE]:
                     choice = options[selected_idx].lower().replace(" ", "_")
                     if choice == "toggle_sfx":
                         sfx_on = not sfx_on
+                        needs_draw = True
                     elif choice == "toggle_music":
                         music_on = not music_on
+                        needs_draw = True
                         if music_on:
                             pygame.mixer.music.unpause()
                         else:
                             pygame.mixer.music.pause()
                     else:
                         return choice, sfx_on, music_on
-        pygame.time.wait(100)
+
+def load_music():
+    pygame.mixer.music.load("assets/audio/background.ogg")
+
+def preload_sprites(screen):
+    # Touching each lazy sprite set at every render scale fills the shared
+    # frame caches, so changing resolution mid-game never rescales a sheet
+    session = GameSession()
+    for render_scale in RENDER_SCALES:
+        session.player.animations_at(render_scale)
+        session.echoes.enemy_sprites.animations_at(render_scale)
+        session.echoes.friend_sprites.animations_at(render_scale)
+        session.artefact.frames_at(render_scale)
+    GameOverAnimation(screen)
 
 def main():
+    startup = StartupTimer(STARTUP_BEGIN)
+    startup.mark("imports")
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    if VSYNC:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED, vsync=1)
+    else:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Echo Dash")
+    startup.mark("display")
     pygame.mixer.init()
+    startup.mark("mixer")
 
-    font = pygame.font.SysFont("consolas", FONT_SIZE)
+    # Audio and sprites decode on a worker while the menu is already up
+    preloader = AssetPreloader([
+        ("music", load_music),
+        ("sprites", lambda: preload_sprites(screen)),
+        ("sounds", load_sounds),
+    ], on_done=startup.assets_loaded if STARTUP_REPORT else None).start()
 
-    sounds = load_sounds()
-    pygame.mixer.music.load("assets/audio/background.ogg")
-    pygame.mixer.music.play(-1)
+    font = pygame.font.SysFont("consolas", FONT_SIZE)
+    startup.mark("font")
 
     sfx_on = True
     music_on = True
+    music_started = False
+
+    def start_music(music_on):
+        # Playback starts here on the main thread, so it always follows the current toggle
+        nonlocal music_started
+        if music_started or not preloader.is_ready("music"):
+            return
+        music_started = True
+        if "music" in preloader.errors:
+            return
+        pygame.mixer.music.play(-1)
+        if not music_on:
+            pygame.mixer.music.pause()
+
+    # Static CRT layers are built once and reused across games
+    crt_filter = CRTFilter()
+    profiler = FrameProfiler(csv_path=PROFILER_CSV_PATH)
+    crt_enabled = CRT_ENABLED
+
+    background = pygame.Surface((WIDTH, HEIGHT)).convert()
+    background.fill(GRAY)
+    renderer = DirtyRectRenderer(background, enabled=DIRTY_RECT_RENDERING)
+    hud = HudLayer(font)
+    scaler = ResolutionScaler()
+    # New echo paths are copied and indexed here while they flash, not on the frame that queues them
+    echo_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="echo-prepare")
 
     while True:
-        menu_action, sfx_on, music_on = menu_loop(screen, font, sfx_on, music_on)
+        menu_action, sfx_on, music_on = menu_loop(screen, font, sfx_on, music_on,
+                                                  on_shown=startup.first_frame_shown if STARTUP_REPORT else None,
+                                                  on_idle=start_music)
         if menu_action == "quit":
             break
         if not music_on:
@@ -71,107 +170,121 @@ def main():
         else:
             pygame.mixer.music.unpause()
 
-        player = Player(pygame.Vector2(5 * TILE_SIZE, 5 * TILE_SIZE))
-        artefact = Artefact(pygame.Vector2(5 * TILE_SIZE, 8 * TILE_SIZE))
-        echoes = EchoManager()
-        echoes.set_sounds(sounds)
+        # Blocks only if Start was pressed before the worker got this far
+        preloader.get("sprites")
+        sounds = preloader.get("sounds")
+        start_music(music_on)
+
+        # Every game gets a concrete seed so it can be recorded and replayed
+        seed = random.randrange(2 ** 62)
+        session = GameSession(seed, sounds=sounds if sfx_on else None, profiler=profiler,
+                              executor=echo_executor)
+        recorder = None
+        if REPLAY_DIR:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            replay_path = os.path.join(REPLAY_DIR, time.strftime("replay-%Y%m%d-%H%M%S.edr"))
+            recorder = ReplayRecorder(replay_path, seed)
 
-        round_number = 1
         running = True
         clock = pygame.time.Clock()
-
-        artefact_count = 0
-        freeze_cost = 3
+        # Fixed-timestep simulation: real time piles up in the accumulator and
+        # is spent in SIM_FPS steps, however fast or slow we render
+        sim_step = 1.0 / SIM_FPS
+        accumulator = 0.0
+        clock.tick()
+        renderer.reset()
+        hud.reset()
+        scaler.reset()
 
         game_state = "playing"
-        game_over_anim = None
+        # Built up front so dying doesn't have to slice frames mid-game
+        game_over_anim = GameOverAnimation(screen)
         game_over_timer = 0
 
-        
-        good_echo_spawn_interval = 4  # Initial interval in rounds
-        good_echo_next_spawn = good_echo_spawn_interval
-
         while running:
             if game_state == "playing":
-                screen.fill(GRAY)
+                # Bounded catch-up: past MAX_CATCHUP_STEPS the game slows down instead of spiralling
+                accumulator = min(accumulator + clock.tick(RENDER_FPS_CAP) / 1000.0, sim_step * MAX_CATCHUP_STEPS)
+                frame_start = time.perf_counter()
+                profiler.start_frame()
+                # Read together: F5 below may change the scale, but this frame is drawn at the one it began with
+                target = scaler.target(screen)
+                render_scale = scaler.scale
+                renderer.begin(target)
                 keys = pygame.key.get_pressed()
 
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         running = False
+                        profiler.close()
+                        if recorder is not None:
+                            recorder.close()
                         return
-
-                move = player.handle_input(keys)
-                dash_pressed = keys[pygame.K_z]
-                freeze_pressed = keys[pygame.K_x]
-
-                if sfx_on:
-                    player.update(move, dash_pressed, sounds["dash"])
-                else:
-                    player.update(move, dash_pressed, type("Silent", (), {"play": lambda *a, **k: None})())
-
-                # Freeze ability: costs artefacts, cost increases after each use
-                if freeze_pressed and not echoes.freeze_bad_echoes and artefact_count >= freeze_cost:
-                    artefact_count -= freeze_cost
-                    echoes.freeze_bad(180)  # 3 seconds at 60 FPS
-                    freeze_cost += 1
-
-                echoes.update(player.pos, screen)
-
-                # Artefact logic
-                artefact.draw(screen)
-                if artefact.check_collection(player.pos):
-                    if sfx_on:
-                        sounds["collect"].play()
-                    loop_path = echoes.recording + echoes.recording[::-1]
-                    echoes.add_echo_buffer(loop_path, loop_path[0])
-                    # Good echo spawns every good_echo_spawn_interval rounds, then interval increases by 2
-                    if round_number == good_echo_next_spawn:
-                        echoes.start_good_echo(GOOD_ECHO_DURATION_BASE, GOOD_ECHO_DURATION_INCREMENT)
-                        good_echo_spawn_interval += 2
-                        good_echo_next_spawn += good_echo_spawn_interval
-                    echoes.recording = []
-                    round_number += 1
-                    artefact.respawn()
-                    artefact_count += 1  # Increment artefact count on collection
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F2:
+                        print(f"CRT bloom: {crt_filter.cycle_bloom_quality()}")
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        profiler.toggle()
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                        crt_enabled = not crt_enabled
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                        print(f"Dynamic resolution: {'on' if scaler.toggle() else 'off'}")
+                profiler.lap("events")
+
+                mask = input_mask_from_keys(keys)
+                collision_round = None
+                while accumulator >= sim_step and collision_round is None:
+                    if recorder is not None:
+                        recorder.record(session, mask)
+                    collision_round = session.step(mask)
+                    accumulator -= sim_step
 
                 # Check collisions with echoes
-                collision_round = echoes.check_collision(player.pos)
                 if collision_round is not None:
                     print(f"Game Over! Touched echo from Round {collision_round}")
+                    if recorder is not None:
+                        recorder.close()
                     pygame.mixer.music.stop()
                     if sfx_on:
                         sounds["gameover"].play()
-                    game_over_anim = GameOverAnimation(screen)
                     game_over_timer = 0
                     game_state = "game_over"
                     continue
 
-               #UI
-                player.draw(screen)
-
-               
-                screen.blit(font.render(f"Round: {round_number}", True, WHITE), (10, 10))
-                dash_status = "Ready" if player.dash_cooldown_timer == 0 else f"Wait ({player.dash_cooldown_timer // 60}s)"
-                screen.blit(font.render(f"Dash: {dash_status}", True, WHITE), (10, 30))
-                screen.blit(font.render(f"Gems: {artefact_count}", True, GREEN), (10, 50))
-                screen.blit(font.render(f"Freeze Cost: {freeze_cost}", True, BLUE), (10, 70))
-                if echoes.good_echo_active:
-                    screen.blit(font.render("Good Echo Active!", True, YELLOW), (10, 90))
-                if echoes.freeze_bad_echoes:
-                    screen.blit(font.render("Freeze Active!", True, BLUE), (10, 110))
-
-                apply_crt_filter(screen)
-                pygame.display.flip()
-                clock.tick(60)
+                render_start = time.perf_counter()
+                alpha = accumulator / sim_step
+                if target is screen:
+                    renderer.mark_all(draw_game(screen, hud, session, alpha))
+                    render_end = time.perf_counter()
+                else:
+                    # World at the reduced scale and one upscale, then the HUD on top at full size
+                    draw_world(target, session, alpha, render_scale)
+                    render_end = time.perf_counter()
+                    scaler.upscale(target, screen)
+                    profiler.lap("upscale")
+                    hud.draw(screen, session)
+                    profiler.lap("hud")
+                # CRT last and at full size at every scale: it covers the HUD too and its scanlines aren't resampled
+                if crt_enabled:
+                    crt_filter.apply(screen)
+                profiler.lap("crt")
+                renderer.mark(profiler.draw_overlay(screen, font))
+                profiler.lap("overlay")
+                # Timed up to the present, which costs the same at any scale and blocks under VSYNC
+                frame_end = time.perf_counter()
+                if scaler.scale == render_scale:
+                    # A frame drawn before an F5 toggle doesn't say anything about the new level.
+                    # Only drawing at the render scale grows with it, the rest costs the same at any level
+                    scaler.record((frame_end - frame_start) * 1000.0, (render_end - render_start) * 1000.0)
+                renderer.present(full_screen_effect=crt_enabled or target is not screen)
+                profiler.lap("flip")
+                profiler.end_frame(len(session.echoes.echoes), session.echoes.trajectory_nbytes())
             elif game_state == "game_over":
                 screen.fill(BLACK)
                 if game_over_anim:
                     game_over_anim.update()
                     game_over_anim.draw()
-             
-             
-                text = font.render("Game Over!", True, RED)
+
+                text = text_cache.render(font, "Game Over!", RED)
                 screen.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 + 80))
                 pygame.display.flip()
                 clock.tick(60)
@@ -183,54 +296,20 @@ def main():
                     running = False
                     break
 
+    echo_executor.shutdown(wait=False)
+    profiler.close()
     pygame.quit()
 
-def apply_crt_filter(screen):
-    """Draws a CRT overlay with scanlines and optional tint."""
-    width, height = screen.get_size()
-    crt_overlay = pygame.Surface((width, height), pygame.SRCALPHA)
-
-    # --- Scanlines ---
-    scanline_color = (0, 0, 0, 40)  # Semi-transparent black
-    scanline_spacing = 2
-    for y in range(0, height, scanline_spacing):
-        pygame.draw.line(crt_overlay, scanline_color, (0, y), (width, y))
-
-    # --- Color tint (subtle blue/green) ---
-    tint_color = (30, 60, 80, 25) 
-    tint_surface = pygame.Surface((width, height), pygame.SRCALPHA)
-    tint_surface.fill(tint_color)
-    crt_overlay.blit(tint_surface, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
-
-    # --- Curved border (simulate barrel distortion) ---
-    border_color = (0, 0, 0, 60)
-    border_width = 24
-    pygame.draw.rect(crt_overlay, border_color, (0, 0, width, height), border_width, border_radius=60)
-
-    
-    small = pygame.transform.smoothscale(screen, (width//2, height//2))
-    bloom = pygame.transform.smoothscale(small, (width, height))
-    bloom.set_alpha(40)
-    screen.blit(bloom, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
-
-   
-    screen.blit(crt_overlay, (0, 0))
-
 class GameOverAnimation:
     def __init__(self, screen):
         self.screen = screen
-        self.sprite_sheet = pygame.image.load("assets/img/player.png").convert_alpha()
         self.frame_width = 64
         self.frame_height = 64
         self.num_frames = 6
-        self.frames = []
         y = 1280  # Row 21
         scale = 2  # Scale up for visibility (optional)
-        for i in range(self.num_frames):
-            rect = pygame.Rect(i * self.frame_width, y, self.frame_width, self.frame_height)
-            frame = self.sprite_sheet.subsurface(rect)
-            frame = pygame.transform.scale(frame, (self.frame_width * scale, self.frame_height * scale))
-            self.frames.append(frame)
+        self.frames = frame_rows("assets/img/player.png", self.frame_width, self.frame_height, [y], self.num_frames,
+                                 (self.frame_width * scale, self.frame_height * scale))[0]
         self.current_frame = 0
         self.frame_delay = 8  # Frames to wait before advancing
         self.frame_timer = 0
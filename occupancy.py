@@ -0,0 +1,161 @@
+import numpy as np
+import pygame
+from settings import WIDTH, HEIGHT, TILE_SIZE, ARTEFACT_PATH_CLEARANCE, ARTEFACT_MIN_DISTANCE
+
+
+class TileTrace:
+    """Tiles an echo box at each sample of a path would touch, kept up as the path is recorded.
+
+    A new sample costs a few integer divisions, and only adds to the set
+    when its box moved onto other tiles, so trace_cells() on the finished
+    path scales with the tiles touched rather than the frames recorded.
+    """
+
+    __slots__ = ("tiles", "left", "top", "right", "bottom")
+
+    def __init__(self):
+        self.tiles = set()
+        self.left = self.top = self.right = self.bottom = None
+
+    def add(self, x, y):
+        """Adds the box at a stored (float32) sample, truncated like path_cells() does."""
+        ix = int(x)
+        iy = int(y)
+        left, right = ix // TILE_SIZE, (ix + TILE_SIZE - 1) // TILE_SIZE
+        top, bottom = iy // TILE_SIZE, (iy + TILE_SIZE - 1) // TILE_SIZE
+        if left == self.left and top == self.top and right == self.right and bottom == self.bottom:
+            return
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+        tiles = self.tiles
+        tiles.add((left, top))
+        tiles.add((left, bottom))
+        tiles.add((right, top))
+        tiles.add((right, bottom))
+
+
+class FreeCellSampler:
+    """Artefact spawn cells that no echo path goes near, sampled in O(1).
+
+    Candidates are the interior TILE_SIZE grid random_artefact_position
+    picks from. Every claimed path adds one to the cover count of each cell
+    within clearance tiles of where it walks. Cells at zero sit in a free
+    list with their slots indexed, so covering or freeing a cell is a
+    swap-remove and a draw is one rng.randrange with no retries.
+    """
+
+    def __init__(self, clearance=ARTEFACT_PATH_CLEARANCE):
+        self.clearance = clearance
+        # Grid columns 1..cols and rows 1..rows, as random_artefact_position uses
+        self.cols = (WIDTH - TILE_SIZE) // TILE_SIZE - 1
+        self.rows = (HEIGHT - TILE_SIZE) // TILE_SIZE - 1
+        count = self.cols * self.rows
+        self.cover = np.zeros(count, dtype=np.int32)
+        self.free = list(range(count))
+        self.slot = list(range(count))  # Cell -> index in free, -1 while covered
+
+    def __len__(self):
+        return len(self.free)
+
+    def cell_pos(self, cell):
+        row, col = divmod(cell, self.cols)
+        return pygame.Vector2((col + 1) * TILE_SIZE, (row + 1) * TILE_SIZE)
+
+    def path_cells(self, trajectory):
+        """Unique candidate cells within clearance tiles of any tile the path's echo touches."""
+        samples = np.frombuffer(trajectory.samples(), dtype=np.float32)
+        if not len(samples):
+            return np.zeros(0, dtype=np.int64)
+        # An echo at (x, y) covers a TILE_SIZE box, which straddles up to four tiles
+        ix = samples[0::2].astype(np.int64)
+        iy = samples[1::2].astype(np.int64)
+        left, right = ix // TILE_SIZE, (ix + TILE_SIZE - 1) // TILE_SIZE
+        top, bottom = iy // TILE_SIZE, (iy + TILE_SIZE - 1) // TILE_SIZE
+        return self.tile_cells(np.concatenate((left, left, right, right)), np.concatenate((top, bottom, top, bottom)))
+
+    def trace_cells(self, trace):
+        """path_cells() for a path whose tiles a TileTrace kept track of, without its samples."""
+        if not trace.tiles:
+            return np.zeros(0, dtype=np.int64)
+        tx, ty = np.array(list(trace.tiles), dtype=np.int64).T
+        return self.tile_cells(tx, ty)
+
+    def tile_cells(self, tx, ty):
+        """Unique candidate cells within clearance tiles of the tiles (tx, ty)."""
+        # Tiles too far out to reach a candidate are clamped just out of reach,
+        # which keeps them in a small range for one flat key per tile
+        low = -self.clearance - 1
+        tx = np.clip(tx, low, self.cols + self.clearance + 1) - low
+        ty = np.clip(ty, low, self.rows + self.clearance + 1) - low
+        span = self.rows + 2 * self.clearance + 3
+        tx, ty = np.divmod(np.unique(tx * span + ty), span)
+
+        # Grow every touched tile by clearance in each direction
+        reach = np.arange(-self.clearance, self.clearance + 1)
+        off_x, off_y = np.meshgrid(reach, reach)
+        gx = (tx[:, None] + (off_x.ravel() + low)).ravel()
+        gy = (ty[:, None] + (off_y.ravel() + low)).ravel()
+        inside = (gx >= 1) & (gx <= self.cols) & (gy >= 1) & (gy <= self.rows)
+        return np.unique((gy[inside] - 1) * self.cols + gx[inside] - 1)
+
+    def claim(self, trajectory):
+        """Covers the cells around trajectory. Returns them for release()."""
+        return self.claim_cells(self.path_cells(trajectory))
+
+    def claim_cells(self, cells):
+        """Covers cells from path_cells() or trace_cells(). Returns them for release()."""
+        cover = self.cover
+        for cell in cells.tolist():
+            if cover[cell] == 0:
+                self._take(cell)
+            cover[cell] += 1
+        return cells
+
+    def release(self, cells):
+        cover = self.cover
+        for cell in cells.tolist():
+            cover[cell] -= 1
+            if cover[cell] == 0:
+                self._put(cell)
+
+    def _take(self, cell):
+        i = self.slot[cell]
+        last = self.free.pop()
+        if last != cell:
+            self.free[i] = last
+            self.slot[last] = i
+        self.slot[cell] = -1
+
+    def _put(self, cell):
+        self.slot[cell] = len(self.free)
+        self.free.append(cell)
+
+    def cells_near(self, pos, distance):
+        """Candidate cells whose position is within distance pixels of pos."""
+        reach = int(distance // TILE_SIZE) + 1
+        col = int(pos[0] // TILE_SIZE)
+        row = int(pos[1] // TILE_SIZE)
+        near = []
+        for gy in range(max(1, row - reach), min(self.rows, row + reach) + 1):
+            for gx in range(max(1, col - reach), min(self.cols, col + reach) + 1):
+                dx = gx * TILE_SIZE - pos[0]
+                dy = gy * TILE_SIZE - pos[1]
+                if dx * dx + dy * dy <= distance * distance:
+                    near.append((gy - 1) * self.cols + gx - 1)
+        return near
+
+    def sample(self, rng, avoid=(), min_distance=ARTEFACT_MIN_DISTANCE * TILE_SIZE):
+        """Uniform free cell further than min_distance from every pos in avoid, or None.
+
+        Free cells near avoid are taken out for the draw and put back after,
+        which touches a constant number of cells whatever the grid size.
+        """
+        held = []
+        for pos in avoid:
+            for cell in self.cells_near(pos, min_distance):
+                if self.slot[cell] >= 0:
+                    self._take(cell)
+                    held.append(cell)
+        pos = self.cell_pos(self.free[rng.randrange(len(self.free))]) if self.free else None
+        for cell in held:
+            self._put(cell)
+        return pos
@@ -1,19 +1,27 @@
 import pygame
+from assets import frame_dict
+from utils import SimState
 from settings import PLAYER_SPEED, DASH_SPEED, DASH_DURATION, DASH_COOLDOWN, TILE_SIZE, WIDTH, HEIGHT
 
 PLAYER_DRAW_SIZE = TILE_SIZE * 2  # Add this line
 
-class Player:
-    def __init__(self, start_pos):
+class Player(SimState):
+    STATE_FIELDS = ("pos", "prev_pos", "speed", "dash_speed", "dash_timer", "dash_cooldown_timer", "is_dashing",
+                    "current_direction", "current_frame", "frame_timer", "moving")
+
+    def __init__(self, start_pos, speed=PLAYER_SPEED, dash_speed=DASH_SPEED, dash_duration=DASH_DURATION,
+                 dash_cooldown=DASH_COOLDOWN):
         self.pos = start_pos
-        self.speed = PLAYER_SPEED
-        self.dash_speed = DASH_SPEED
+        self.prev_pos = pygame.Vector2(start_pos)  # Position before the last step, for render interpolation
+        self.speed = speed
+        self.dash_speed = dash_speed
+        self.dash_duration = dash_duration
+        self.dash_cooldown = dash_cooldown
         self.dash_timer = 0
         self.dash_cooldown_timer = 0
         self.is_dashing = False
 
         # Animation setup
-        self.sprite_sheet = pygame.image.load("assets/img/player.png").convert_alpha()
         self.frame_width = 64
         self.frame_height = 64
         self.frames_per_row = 9  # Only first 9 frames per row
@@ -26,17 +34,6 @@ class Player:
             "down": 640,
             "right": 704,
         }
-        self.animations = {}
-        for dir_name in self.directions:
-            y = self.row_map[dir_name]
-            frames = []
-            for i in range(self.frames_per_row):
-                rect = pygame.Rect(i * self.frame_width, y, self.frame_width, self.frame_height)
-                frame = self.sprite_sheet.subsurface(rect)
-                # Scale to PLAYER_DRAW_SIZE (2x) instead of TILE_SIZE
-                frame = pygame.transform.scale(frame, (PLAYER_DRAW_SIZE, PLAYER_DRAW_SIZE))
-                frames.append(frame)
-            self.animations[dir_name] = frames
 
         self.current_direction = "down"
         self.current_frame = 0
@@ -44,15 +41,26 @@ class Player:
         self.frame_delay = 6  # Adjust for animation speed
 
         self.moving = False
+        self.move = pygame.Vector2()  # Reused by handle_input every step
+
+    @property
+    def animations(self):
+        return self.animations_at(1.0)
+
+    def animations_at(self, render_scale):
+        # Scale to PLAYER_DRAW_SIZE (2x) instead of TILE_SIZE
+        return frame_dict("assets/img/player.png", self.frame_width, self.frame_height, self.directions, self.row_map,
+                          self.frames_per_row, (PLAYER_DRAW_SIZE, PLAYER_DRAW_SIZE), render_scale)
 
     def handle_input(self, keys):
-        move = pygame.Vector2(0, 0)
+        move = self.move
+        move.update(0, 0)
         if keys[pygame.K_LEFT]: move.x -= 1
         if keys[pygame.K_RIGHT]: move.x += 1
         if keys[pygame.K_UP]: move.y -= 1
         if keys[pygame.K_DOWN]: move.y += 1
         if move.length_squared() > 0:
-            move = move.normalize()
+            move.normalize_ip()
             # Determine direction for animation
             if abs(move.x) > abs(move.y):
                 self.current_direction = "right" if move.x > 0 else "left"
@@ -64,10 +72,11 @@ class Player:
         return move
 
     def update(self, move, dash_pressed, dash_sound):
+        self.prev_pos.update(self.pos)
         if dash_pressed and self.dash_timer == 0 and self.dash_cooldown_timer == 0:
             self.is_dashing = True
-            self.dash_timer = DASH_DURATION
-            self.dash_cooldown_timer = DASH_COOLDOWN + DASH_DURATION
+            self.dash_timer = self.dash_duration
+            self.dash_cooldown_timer = self.dash_cooldown + self.dash_duration
             dash_sound.play()
 
         if self.dash_timer > 0:
@@ -81,7 +90,8 @@ class Player:
         if self.dash_cooldown_timer > 0:
             self.dash_cooldown_timer -= 1
 
-        self.pos += move * current_speed
+        self.pos.x += move.x * current_speed
+        self.pos.y += move.y * current_speed
         # Keep inside bounds (adjust for new draw size)
         self.pos.x = max(0, min(WIDTH - PLAYER_DRAW_SIZE, self.pos.x))
         self.pos.y = max(0, min(HEIGHT - PLAYER_DRAW_SIZE, self.pos.y))
@@ -95,6 +105,9 @@ class Player:
         else:
             self.current_frame = 0  # Idle pose
 
-    def draw(self, screen):
-        frame = self.animations[self.current_direction][self.current_frame]
-        screen.blit(frame, self.pos)
+    def draw(self, screen, alpha=1.0, render_scale=1.0):
+        frame = self.animations_at(render_scale)[self.current_direction][self.current_frame]
+        pos = self.prev_pos.lerp(self.pos, alpha)
+        if render_scale != 1.0:
+            pos *= render_scale
+        return screen.blit(frame, pos)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+
+class AssetPreloader:
+    """Runs named loader jobs in order on a background thread.
+
+    The menu can come up straight away while audio and sprites decode;
+    get(name) hands out a job's result, blocking until the worker has
+    produced it. An exception raised by a job is re-raised from get().
+    """
+
+    def __init__(self, jobs, on_done=None):
+        self.jobs = list(jobs)  # (name, callable) pairs, run in this order
+        self.on_done = on_done
+        self.results = {}
+        self.errors = {}
+        self.timings = {}  # name -> seconds spent in the job
+        self.ready = {name: threading.Event() for name, _ in self.jobs}
+        self.thread = threading.Thread(target=self._run, name="asset-preloader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        for name, load in self.jobs:
+            start = time.perf_counter()
+            try:
+                self.results[name] = load()
+            except Exception as error:
+                self.errors[name] = error
+            self.timings[name] = time.perf_counter() - start
+            self.ready[name].set()
+        if self.on_done is not None:
+            self.on_done(self)
+
+    def is_ready(self, name):
+        return self.ready[name].is_set()
+
+    def get(self, name):
+        self.ready[name].wait()
+        if name in self.errors:
+            raise self.errors[name]
+        return self.results[name]
+
+
+class StartupTimer:
+    """Cold-start stopwatch for main-thread phases plus the preloader's jobs.
+
+    mark(phase) charges the time since the previous mark to phase. The
+    report prints once both the first frame is up and the preloader is done.
+    """
+
+    def __init__(self, begin):
+        self.begin = begin
+        self.last = begin
+        self.phases = []
+        self.shown_after = None
+        self.preloader = None
+        self.reported = False
+        self.lock = threading.Lock()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def first_frame_shown(self):
+        if self.shown_after is not None:
+            return  # Only the first time the menu comes up counts
+        self.mark("first frame")
+        self.shown_after = self.last - self.begin
+        self._maybe_report()
+
+    def assets_loaded(self, preloader):
+        self.preloader = preloader
+        self._maybe_report()
+
+    def _maybe_report(self):
+        with self.lock:
+            if self.reported or self.shown_after is None or self.preloader is None:
+                return
+            self.reported = True
+        print(self.report())
+
+    def report(self):
+        main_thread = ", ".join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in self.phases)
+        line = f"startup: {main_thread} (menu up after {self.shown_after * 1000:.1f} ms)"
+        if self.preloader is not None:
+            assets = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.preloader.timings.items())
+            line += f"; assets on worker: {assets}"
+        return line
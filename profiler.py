@@ -0,0 +1,213 @@
+import csv
+import gc
+import time
+import tracemalloc
+from array import array
+import pygame
+from settings import WHITE, YELLOW
+
+# Stages of one playing frame, in the order main runs them
+FRAME_STAGES = ("events", "player", "echoes", "artefact", "collision", "world", "upscale", "hud", "crt", "overlay", "flip")
+
+# Upper edges (ms) of the rolling histogram buckets; the last one catches everything
+HISTOGRAM_EDGES_MS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3, float("inf"))
+
+
+class FrameProfiler:
+    """Per-stage frame timer with rolling histograms.
+
+    Call start_frame(), then lap(stage) after each stage and end_frame()
+    once the frame is presented. enabled only shows the overlay: frames are
+    timed while it is on or while a csv_path export is set, which records
+    every frame from the first. Otherwise every call returns straight away,
+    so it can stay wired into the game loop.
+    """
+
+    def __init__(self, stages=FRAME_STAGES, window=240, csv_path=None):
+        self.enabled = False
+        self.stages = tuple(stages)
+        self.window = window
+        self.csv_path = csv_path
+        self._csv_file = None
+        self._csv_writer = None
+        if csv_path:
+            self._csv_file = open(csv_path, "w", newline="")
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(("frame",) + tuple(f"{s}_ms" for s in self.stages) + ("echoes", "trajectory_bytes"))
+        self.timing = self._csv_writer is not None
+
+        n = len(self.stages)
+        self.index = {name: i for i, name in enumerate(self.stages)}
+        self.current = array("d", bytes(8 * n))
+        self.history = [array("d", bytes(8 * window)) for _ in range(n)]
+        self.histograms = [array("l", bytes(array("l").itemsize * len(HISTOGRAM_EDGES_MS))) for _ in range(n)]
+        self.totals = array("d", bytes(8 * n))
+        self.cursor = 0
+        self.samples = 0
+        self.frame = 0
+        self.counters = {}
+        self._last = 0.0
+
+    def set_enabled(self, enabled):
+        """Shows or hides the overlay; a CSV export keeps recording either way."""
+        was_timing = self.timing
+        self.enabled = enabled
+        self.timing = enabled or self._csv_writer is not None
+        if self.timing and not was_timing:
+            # May be switched on mid-frame, start timing from here
+            self.start_frame()
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+        return self.enabled
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
+            self.timing = self.enabled
+
+    def start_frame(self):
+        if not self.timing:
+            return
+        current = self.current
+        for i in range(len(current)):
+            current[i] = 0.0
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Charges the time since the previous lap to stage."""
+        if not self.timing:
+            return
+        now = time.perf_counter()
+        self.current[self.index[stage]] += now - self._last
+        self._last = now
+
+    def end_frame(self, echoes=0, trajectory_bytes=0):
+        if not self.timing:
+            return
+        slot = self.cursor
+        full = self.samples >= self.window
+        for i in range(len(self.stages)):
+            ms = self.current[i] * 1000.0
+            history = self.history[i]
+            if full:
+                # Evict the sample this slot held from the rolling stats
+                old = history[slot]
+                self.totals[i] -= old
+                self.histograms[i][_bucket(old)] -= 1
+            history[slot] = ms
+            self.totals[i] += ms
+            self.histograms[i][_bucket(ms)] += 1
+        self.cursor = (slot + 1) % self.window
+        self.samples = min(self.samples + 1, self.window)
+        self.frame += 1
+        self.counters["echoes"] = echoes
+        self.counters["trajectory_bytes"] = trajectory_bytes
+
+        if self._csv_writer is not None:
+            self._csv_writer.writerow([self.frame] + [round(t * 1000.0, 4) for t in self.current] + [echoes, trajectory_bytes])
+
+    def mean_ms(self, stage):
+        return self.totals[self.index[stage]] / max(1, self.samples)
+
+    def percentile_ms(self, stage, q):
+        """Upper edge of the histogram bucket holding the q-th percentile."""
+        histogram = self.histograms[self.index[stage]]
+        target = q * self.samples
+        seen = 0
+        for edge, count in zip(HISTOGRAM_EDGES_MS, histogram):
+            seen += count
+            if seen >= target:
+                return edge
+        return HISTOGRAM_EDGES_MS[-1]
+
+    def draw_overlay(self, screen, font):
+        """Draws the stats panel in the top right corner and returns its rect."""
+        if not self.enabled:
+            return None
+        line_height = font.get_linesize()
+        lines = [f"{'stage':10s} {'avg ms':>7s} {'p95 <=':>7s}"]
+        total = 0.0
+        for stage in self.stages:
+            mean = self.mean_ms(stage)
+            total += mean
+            lines.append(f"{stage:10s} {mean:7.2f} {self.percentile_ms(stage, 0.95):7.2f}")
+        lines.append(f"{'frame':10s} {total:7.2f}")
+        lines.append(f"echoes {self.counters.get('echoes', 0)}  "
+                     f"paths {self.counters.get('trajectory_bytes', 0) / 1024:.0f} KiB")
+
+        width = 300
+        panel = pygame.Surface((width, line_height * len(lines) + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        x = screen.get_width() - width - 10
+        panel_rect = screen.blit(panel, (x, 10))
+        for i, line in enumerate(lines):
+            color = YELLOW if i == 0 else WHITE
+            screen.blit(font.render(line, True, color), (x + 6, 14 + i * line_height))
+        return panel_rect
+
+
+class AllocationCounter:
+    """Debug check that a stretch of code, normally one simulation step, allocates nothing.
+
+    objects is the net change in GC-tracked objects, the generation-0
+    count that triggers collections; a steady-state step should leave it
+    at zero. With trace_memory, tracemalloc also reports the peak bytes
+    held above the starting point, which catches untracked temporaries
+    such as NumPy scratch arrays. Automatic collection is paused between
+    start() and stop() so it can't reset the count mid-measure.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.frames = 0
+        self.allocating_frames = 0
+        self.total_bytes = 0
+        self.max_bytes = 0
+        self.max_objects = 0
+        self._objects = 0
+        self._bytes = 0
+        self._gc_was_enabled = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._gc_was_enabled = gc.isenabled()
+        gc.disable()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self._bytes = tracemalloc.get_traced_memory()[0]
+        self._objects = gc.get_count()[0]
+
+    def stop(self, record=True):
+        """Ends the measure and returns (objects, peak bytes). record=False leaves it out of the totals."""
+        objects = gc.get_count()[0] - self._objects
+        peak = tracemalloc.get_traced_memory()[1] - self._bytes if self.trace_memory else 0
+        if self._gc_was_enabled:
+            gc.enable()
+        if record:
+            self.frames += 1
+            if objects > 0:
+                self.allocating_frames += 1
+            self.total_bytes += peak
+            self.max_bytes = max(self.max_bytes, peak)
+            self.max_objects = max(self.max_objects, objects)
+        return objects, peak
+
+    def summary(self):
+        frames = max(1, self.frames)
+        return (f"{self.frames} steps, {self.allocating_frames} left GC objects behind (max {self.max_objects}); "
+                f"temporaries max {self.max_bytes} B, mean {self.total_bytes / frames:.0f} B")
+
+
+def _bucket(ms):
+    for i, edge in enumerate(HISTOGRAM_EDGES_MS):
+        if ms <= edge:
+            return i
+    return len(HISTOGRAM_EDGES_MS) - 1
+
+
+# Shared disabled profiler for code paths that don't care about timing
+NULL_PROFILER = FrameProfiler()
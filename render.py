@@ -0,0 +1,75 @@
+import pygame
+from settings import DIRTY_AREA_THRESHOLD
+
+
+class DirtyRectRenderer:
+    """Redraws and presents only the parts of the screen that changed.
+
+    Each frame, begin() restores the background under everything drawn the
+    frame before. Draw calls report their rects through mark(). present()
+    then pushes the old and new rects to the display. It falls back to a
+    full flip when the dirty area passes area_threshold of the screen, when
+    a full-screen effect was drawn, or while disabled. Drawing to a smaller
+    render target gets the background scaled to match, cached per size.
+    """
+
+    def __init__(self, background, enabled=True, area_threshold=DIRTY_AREA_THRESHOLD):
+        self.background = background
+        self.backgrounds = {background.get_size(): background}
+        self.size = background.get_size()
+        self.enabled = enabled
+        self.area_threshold = area_threshold
+        self.screen_area = background.get_width() * background.get_height()
+        self.previous = []
+        self.current = []
+        self.needs_full_clear = True
+
+    def reset(self):
+        """Forces a full clear and flip on the next frame."""
+        self.previous = []
+        self.current = []
+        self.needs_full_clear = True
+
+    def background_at(self, size):
+        background = self.backgrounds.get(size)
+        if background is None:
+            background = pygame.transform.scale(self.background, size)
+            self.backgrounds[size] = background
+        return background
+
+    def begin(self, screen):
+        size = screen.get_size()
+        if size != self.size:
+            # New render target, last frame's rects were on another one
+            self.size = size
+            self.needs_full_clear = True
+        background = self.background_at(size)
+        if not self.enabled or self.needs_full_clear:
+            screen.blit(background, (0, 0))
+        else:
+            for rect in self.previous:
+                screen.blit(background, rect, rect)
+        self.current = []
+
+    def mark(self, rect):
+        if rect is not None:
+            self.current.append(rect)
+
+    def mark_all(self, rects):
+        for rect in rects:
+            if rect is not None:
+                self.current.append(rect)
+
+    def present(self, full_screen_effect=False):
+        dirty = self.previous + self.current
+        area = 0
+        for rect in dirty:
+            area += rect.width * rect.height
+        if not self.enabled or full_screen_effect or self.needs_full_clear or area > self.area_threshold * self.screen_area:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty)
+        # A full-screen effect touched every pixel, so rect restores won't undo it
+        self.needs_full_clear = full_screen_effect
+        self.previous = self.current
+        return dirty
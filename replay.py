@@ -0,0 +1,362 @@
+"""Session replays: per-frame inputs plus periodic keyframes in one binary file.
+
+A replay file is a header followed by append-only records. Input records
+hold one mask byte per frame; keyframe records hold a compressed
+GameSession snapshot taken before that frame was stepped. Seeking restores
+the nearest earlier keyframe and re-simulates forward from it.
+
+Keyframes are plain data, never pickles, so opening a replay someone sent
+can't run code: a JSON tree of primitives whose arrays are stored as raw
+bytes after it. Objects are tagged with one of SNAPSHOT_CLASSES and must
+carry exactly that class's fields, or loading fails with ValueError.
+
+    python replay.py replays/replay-20260101-120000.edr --seek 5000
+    python replay.py replays/replay-20260101-120000.edr --verify
+"""
+import argparse
+import bisect
+import json
+import mmap
+import struct
+import zlib
+import numpy as np
+import pygame
+from game import GameSession
+from echo import EchoBuffer, GoodEcho
+from echo_pack import EchoPack
+from occupancy import FreeCellSampler, TileTrace
+from trajectory import Trajectory
+
+MAGIC = b"EDRP"
+VERSION = 2
+HEADER = struct.Struct("<4sHHq")  # magic, version, flags, seed
+RECORD = struct.Struct("<BII")  # kind, first frame, payload length
+
+KIND_INPUTS = 1
+KIND_KEYFRAME = 2
+
+KEYFRAME_INTERVAL = 10 * 60  # Frames between keyframes
+INPUT_BLOCK_FRAMES = 256  # Masks buffered before an input record is written
+
+KEYFRAME_VERSION = 1
+KEYFRAME_HEADER = struct.Struct("<HI")  # keyframe version, JSON length
+ARRAY_KINDS = "biuf"  # Bool, int, unsigned and float arrays only
+
+# The only objects a keyframe can hold, by tag
+SNAPSHOT_CLASSES = {cls.__name__: cls for cls in (EchoPack, FreeCellSampler, TileTrace, EchoBuffer, GoodEcho)}
+_snapshot_fields = {}
+
+
+def snapshot_fields(cls):
+    """Field names a snapshot of cls carries."""
+    fields = _snapshot_fields.get(cls)
+    if fields is None:
+        if cls is EchoPack:
+            fields = frozenset(EchoPack().__getstate__())
+        elif "__slots__" in cls.__dict__:
+            fields = frozenset(cls.__slots__)
+        else:
+            fields = frozenset(vars(cls()))
+        _snapshot_fields[cls] = fields
+    return fields
+
+
+def to_plain(value, arrays):
+    """JSON-ready tree for a snapshot value; arrays are appended to arrays and referenced by index."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.ndarray):
+        arrays.append(np.ascontiguousarray(value))
+        return {"array": [len(arrays) - 1, value.dtype.str, list(value.shape)]}
+    if isinstance(value, np.generic):
+        return {"scalar": [value.dtype.str, value.item()]}
+    if isinstance(value, list):
+        return {"list": [to_plain(v, arrays) for v in value]}
+    if isinstance(value, tuple):
+        return {"tuple": [to_plain(v, arrays) for v in value]}
+    if isinstance(value, set):
+        return {"set": [to_plain(v, arrays) for v in value]}
+    if isinstance(value, dict):
+        return {"dict": [[to_plain(k, arrays), to_plain(v, arrays)] for k, v in value.items()]}
+    if isinstance(value, pygame.Vector2):
+        return {"vector2": [value.x, value.y]}
+    if isinstance(value, Trajectory):
+        return {"trajectory": to_plain(np.frombuffer(value.samples(), dtype=np.float32), arrays)}
+    name = type(value).__name__
+    if SNAPSHOT_CLASSES.get(name) is not type(value):
+        raise TypeError(f"{type(value).__qualname__} can't go in a keyframe")
+    if isinstance(value, EchoPack):
+        fields = value.__getstate__()
+    else:
+        fields = {field: getattr(value, field) for field in snapshot_fields(type(value))}
+    return {"object": [name, to_plain(fields, arrays)]}
+
+
+def from_plain(node, arrays):
+    """Inverse of to_plain(), checking every tag, dtype and field list on the way."""
+    if node is None or isinstance(node, (bool, int, float, str)):
+        return node
+    if not isinstance(node, dict) or len(node) != 1:
+        raise ValueError(f"malformed keyframe node {node!r:.80}")
+    (tag, body), = node.items()
+    if tag == "array":
+        index, dtype, shape = body
+        array = arrays[index]
+        if array.dtype.str != dtype or list(array.shape) != shape:
+            raise ValueError(f"keyframe array {index} is not {dtype} {shape}")
+        return array
+    if tag == "scalar":
+        dtype, value = body
+        dtype = np.dtype(dtype)
+        if dtype.kind not in ARRAY_KINDS:
+            raise ValueError(f"keyframe scalar of dtype {dtype}")
+        return dtype.type(value)
+    if tag == "list":
+        return [from_plain(v, arrays) for v in body]
+    if tag == "tuple":
+        return tuple(from_plain(v, arrays) for v in body)
+    if tag == "set":
+        return {from_plain(v, arrays) for v in body}
+    if tag == "dict":
+        return {from_plain(k, arrays): from_plain(v, arrays) for k, v in body}
+    if tag == "vector2":
+        return pygame.Vector2(*body)
+    if tag == "trajectory":
+        samples = from_plain(body, arrays)
+        if samples.dtype != np.float32 or samples.ndim != 1 or len(samples) % 2:
+            raise ValueError("keyframe trajectory is not a flat float32 (x, y) array")
+        trajectory = Trajectory.__new__(Trajectory)
+        trajectory.__setstate__((len(samples) // 2, samples.tobytes()))
+        return trajectory
+    if tag == "object":
+        name, fields = body
+        cls = SNAPSHOT_CLASSES.get(name)
+        if cls is None:
+            raise ValueError(f"keyframe object of unknown type {name!r:.80}")
+        fields = from_plain(fields, arrays)
+        if not isinstance(fields, dict) or set(fields) != snapshot_fields(cls):
+            raise ValueError(f"keyframe {name} fields don't match this version of the game")
+        value = cls.__new__(cls)
+        if cls is EchoPack:
+            value.__setstate__(fields)
+        else:
+            for field, field_value in fields.items():
+                setattr(value, field, field_value)
+        return value
+    raise ValueError(f"unknown keyframe tag {tag!r:.80}")
+
+
+def encode_state(state):
+    arrays = []
+    tree = json.dumps(to_plain(state, arrays), separators=(",", ":")).encode()
+    parts = [KEYFRAME_HEADER.pack(KEYFRAME_VERSION, len(tree)), tree] + [array.tobytes() for array in arrays]
+    return zlib.compress(b"".join(parts), 6)
+
+
+def decode_state(payload):
+    """The snapshot in a keyframe payload; ValueError if it isn't a valid one."""
+    try:
+        return _decode_state(payload)
+    except (TypeError, KeyError, IndexError, AttributeError, struct.error, zlib.error) as error:
+        raise ValueError(f"malformed keyframe: {error}") from error
+
+
+def _decode_state(payload):
+    data = zlib.decompress(payload)
+    version, tree_length = KEYFRAME_HEADER.unpack_from(data)
+    if version != KEYFRAME_VERSION:
+        raise ValueError(f"keyframe version {version}, expected {KEYFRAME_VERSION}")
+    start = KEYFRAME_HEADER.size
+    tree = json.loads(data[start:start + tree_length])
+
+    # Array nodes come in index order, their bytes back to back after the tree
+    specs = []
+
+    def collect(node):
+        if isinstance(node, dict):
+            if "array" in node and len(node) == 1:
+                specs.append(node["array"])
+            for child in node.values():
+                collect(child)
+        elif isinstance(node, list):
+            for child in node:
+                collect(child)
+
+    collect(tree)
+    arrays = []
+    offset = start + tree_length
+    for index, dtype, shape in sorted(specs, key=lambda spec: spec[0]):
+        dtype = np.dtype(dtype)
+        if index != len(arrays) or dtype.kind not in ARRAY_KINDS or any(n < 0 for n in shape):
+            raise ValueError(f"bad keyframe array {index}")
+        size = int(np.prod(shape)) * dtype.itemsize
+        if offset + size > len(data):
+            raise ValueError("keyframe arrays run past the payload")
+        arrays.append(np.frombuffer(data, dtype=dtype, count=size // dtype.itemsize, offset=offset)
+                      .reshape(shape).copy())
+        offset += size
+    return from_plain(tree, arrays)
+
+
+def states_equal(a, b):
+    """Deep comparison of two snapshots; pickled bytes differ with object sharing."""
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(states_equal(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return type(a) is type(b) and len(a) == len(b) and all(states_equal(x, y) for x, y in zip(a, b))
+    if hasattr(a, "__getstate__") and type(a).__module__ not in ("builtins", "pygame.math"):
+        return type(a) is type(b) and states_equal(a.__getstate__(), b.__getstate__())
+    return a == b
+
+
+class ReplayRecorder:
+    """Appends a session's inputs and keyframes to a replay file.
+
+    Call record(session, mask) right before session.step(mask).
+    """
+
+    def __init__(self, path, seed, keyframe_interval=KEYFRAME_INTERVAL, block_frames=INPUT_BLOCK_FRAMES):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.block_frames = block_frames
+        self.pending = bytearray()
+        self.pending_start = 0
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, seed))
+
+    def record(self, session, mask):
+        frame = session.frame
+        if frame % self.keyframe_interval == 0:
+            self.flush()
+            self._write(KIND_KEYFRAME, frame, encode_state(session.snapshot()))
+        if not self.pending:
+            self.pending_start = frame
+        self.pending.append(mask)
+        if len(self.pending) >= self.block_frames:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self._write(KIND_INPUTS, self.pending_start, self.pending)
+            self.pending = bytearray()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def _write(self, kind, frame, payload):
+        self.file.write(RECORD.pack(kind, frame, len(payload)))
+        self.file.write(payload)
+
+
+class Replay:
+    """Memory-mapped replay file with keyframe seeking."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _flags, self.seed = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} replay file")
+
+        self.input_starts = []
+        self.input_offsets = []
+        self.input_lengths = []
+        self.keyframe_frames = []
+        self.keyframe_offsets = []
+        self.keyframe_lengths = []
+        self.frames = 0
+        self._index()
+
+    def _index(self):
+        # Only record headers are read, payloads stay in the mapping until needed
+        pos = HEADER.size
+        size = len(self.data)
+        while pos + RECORD.size <= size:
+            kind, frame, length = RECORD.unpack_from(self.data, pos)
+            pos += RECORD.size
+            if pos + length > size:
+                break  # Truncated by a crash mid-write
+            if kind == KIND_INPUTS:
+                self.input_starts.append(frame)
+                self.input_offsets.append(pos)
+                self.input_lengths.append(length)
+                self.frames = frame + length
+            elif kind == KIND_KEYFRAME:
+                self.keyframe_frames.append(frame)
+                self.keyframe_offsets.append(pos)
+                self.keyframe_lengths.append(length)
+            pos += length
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def mask_at(self, frame):
+        i = bisect.bisect_right(self.input_starts, frame) - 1
+        if i < 0 or frame >= self.input_starts[i] + self.input_lengths[i]:
+            raise IndexError(f"no input recorded for frame {frame}")
+        return self.data[self.input_offsets[i] + frame - self.input_starts[i]]
+
+    def keyframe_state(self, i):
+        offset = self.keyframe_offsets[i]
+        return decode_state(self.data[offset:offset + self.keyframe_lengths[i]])
+
+    def seek(self, frame, session=None):
+        """Returns a session positioned right before frame is stepped.
+
+        A passed-in session already between the nearest keyframe and frame
+        is stepped forward as-is instead of being restored.
+        """
+        if not 0 <= frame <= self.frames:
+            raise IndexError(f"frame {frame} outside replay of {self.frames} frames")
+        i = bisect.bisect_right(self.keyframe_frames, frame) - 1
+        if i < 0:
+            raise ValueError("replay has no keyframe before the requested frame")
+        keyframe = self.keyframe_frames[i]
+        if session is None or not keyframe <= session.frame <= frame:
+            session = session or GameSession(self.seed)
+            session.restore(self.keyframe_state(i))
+        while session.frame < frame:
+            session.step(self.mask_at(session.frame))
+        return session
+
+    def verify(self):
+        """Re-simulates from frame 0 and checks every keyframe matches. Returns mismatching frames."""
+        mismatches = []
+        session = GameSession(self.seed)
+        for i, frame in enumerate(self.keyframe_frames):
+            session = self.seek(frame, session)
+            expected = self.keyframe_state(i)
+            if not states_equal(session.snapshot(), expected):
+                mismatches.append(frame)
+                session.restore(expected)
+        return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect an Echo Dash replay")
+    parser.add_argument("path")
+    parser.add_argument("--seek", type=int, help="Print the session state at this frame")
+    parser.add_argument("--verify", action="store_true", help="Re-simulate and check every keyframe")
+    args = parser.parse_args()
+
+    replay = Replay(args.path)
+    print(f"seed {replay.seed}, {replay.frames} frames, {len(replay.keyframe_frames)} keyframes")
+    if args.seek is not None:
+        summary = replay.seek(args.seek).summary()
+        summary.pop("rounds")
+        print(summary)
+    if args.verify:
+        mismatches = replay.verify()
+        print("replay is deterministic" if not mismatches else f"keyframes diverged at frames {mismatches}")
+    replay.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import pygame
+from assets import scaled_size
+from settings import SIM_FPS, DYNAMIC_RESOLUTION, RENDER_SCALES, RESOLUTION_WINDOW, RESOLUTION_HEADROOM
+
+
+class ResolutionScaler:
+    """Render scale for the world, stepped between levels to hold a frame time budget.
+
+    record() takes each frame's work time and the part of it spent
+    drawing at the render scale. After window frames, a mean frame over budget drops one
+    level. The level above is taken back only if the frame, with its
+    rendering grown by the pixel ratio, would fit in headroom of the
+    budget. Anything in between keeps the level, and the window starts
+    over after every decision so each level is judged on its own frames.
+    """
+
+    def __init__(self, levels=RENDER_SCALES, budget_ms=1000.0 / SIM_FPS, window=RESOLUTION_WINDOW,
+                 headroom=RESOLUTION_HEADROOM, enabled=DYNAMIC_RESOLUTION):
+        self.levels = tuple(sorted(levels, reverse=True))
+        self.budget_ms = budget_ms
+        self.window = window
+        self.headroom = headroom
+        self.enabled = enabled
+        self.level = 0
+        self.frame_total = 0.0
+        self.render_total = 0.0
+        self.frames = 0
+        self.targets = {}  # Size -> internal render Surface, one per level
+
+    @property
+    def scale(self):
+        return self.levels[self.level] if self.enabled else 1.0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.reset()
+        return self.enabled
+
+    def reset(self):
+        """Back to full scale with an empty window, e.g. for a new game."""
+        self.level = 0
+        self.frame_total = 0.0
+        self.render_total = 0.0
+        self.frames = 0
+
+    def record(self, frame_ms, render_ms):
+        """Adds one frame's timings. Returns True when the scale changed."""
+        if not self.enabled:
+            return False
+        self.frame_total += frame_ms
+        self.render_total += render_ms
+        self.frames += 1
+        if self.frames < self.window:
+            return False
+        frame_mean = self.frame_total / self.frames
+        render_mean = self.render_total / self.frames
+        self.frame_total = 0.0
+        self.render_total = 0.0
+        self.frames = 0
+
+        level = self.level
+        if frame_mean > self.budget_ms and level + 1 < len(self.levels):
+            self.level += 1
+        elif level > 0:
+            pixel_ratio = (self.levels[level - 1] / self.levels[level]) ** 2
+            if frame_mean + render_mean * (pixel_ratio - 1.0) < self.headroom * self.budget_ms:
+                self.level -= 1
+        return self.level != level
+
+    def target(self, screen):
+        """Surface to draw the world on this frame: the screen itself at full scale."""
+        scale = self.scale
+        if scale == 1.0:
+            return screen
+        size = scaled_size(screen.get_size(), scale)
+        surface = self.targets.get(size)
+        if surface is None:
+            surface = pygame.Surface(size, 0, screen)
+            self.targets[size] = surface
+        return surface
+
+    def upscale(self, target, screen):
+        """Stretches a reduced target over the whole screen in one pass."""
+        if target is not screen:
+            pygame.transform.scale(target, screen.get_size(), screen)
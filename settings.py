@@ -13,6 +13,14 @@ GRAY = (100, 100, 100)
 
 FONT_SIZE = 20
 
+# Simulation runs at a fixed SIM_FPS; rendering interpolates between steps.
+# RENDER_FPS_CAP = 0 renders uncapped, VSYNC syncs presents to the display instead.
+SIM_FPS = 60
+MAX_CATCHUP_STEPS = 5
+RENDER_FPS_CAP = 120
+VSYNC = False
+MENU_EVENT_TIMEOUT_MS = 250  # Longest the menu sleeps waiting for input
+
 PLAYER_SPEED = 2.5
 DASH_SPEED = 5
 DASH_DURATION = 60
@@ -22,3 +30,56 @@ ECHO_BUFFER_TIME = 120
 GOOD_ECHO_LAG_FRAMES = 80
 GOOD_ECHO_DURATION_BASE = 10 * 60
 GOOD_ECHO_DURATION_INCREMENT = 2 * 60
+
+# CRT filter bloom quality: "off", "half", "quarter" or "every_n"
+# ("every_n" reuses a half-res bloom for CRT_BLOOM_INTERVAL frames). F2 cycles in game.
+CRT_BLOOM_QUALITY = "half"
+CRT_BLOOM_INTERVAL = 4
+CRT_ENABLED = True  # F4 toggles in game
+
+# Dirty-rectangle rendering: only redraw and present what changed. Full-screen
+# effects (CRT) or a dirty area above DIRTY_AREA_THRESHOLD of the screen fall
+# back to full updates.
+DIRTY_RECT_RENDERING = False
+DIRTY_AREA_THRESHOLD = 0.4
+
+# Dynamic resolution: the world is drawn at one of RENDER_SCALES of the window
+# and upscaled, dropping a level when frames run over the 1 / SIM_FPS budget
+# and going back up once the larger level is predicted to fit in
+# RESOLUTION_HEADROOM of it. Decisions are made every RESOLUTION_WINDOW frames.
+# F5 toggles in game.
+DYNAMIC_RESOLUTION = True
+RENDER_SCALES = (1.0, 0.75, 0.5)
+RESOLUTION_WINDOW = 30
+RESOLUTION_HEADROOM = 0.8
+
+# Directory to record a replay of every game into (see replay.py), None to disable
+REPLAY_DIR = None
+
+# Frame profiler (F3 toggles the overlay). Set a path to also stream per-frame samples to CSV.
+PROFILER_CSV_PATH = None
+
+# Echo recordings are kept raw while all live paths fit in this many bytes;
+# beyond it new paths are stored run-length encoded (see echo_pack.py)
+ECHO_PATH_MEMORY_BUDGET = 8 * 1024 * 1024
+
+# Print cold-start timings (imports, display, mixer, first frame, asset decode) once loaded
+STARTUP_REPORT = True
+
+# Pack of ready-to-use sprite frames and sound effects written by bake.py.
+# It's used while it matches the source files it was baked from; None to
+# always decode assets/img and assets/audio instead.
+ASSET_PACK_PATH = "assets/pack.edp"
+
+# Artefact respawn (see occupancy.py): tiles kept clear around every echo path,
+# and the minimum distance in tiles from the player and the collected artefact
+ARTEFACT_PATH_CLEARANCE = 1
+ARTEFACT_MIN_DISTANCE = 3
+
+# Once no cell is clear of every echo path, respawn tries this many random
+# cells and keeps one no echo reaches within ARTEFACT_SAFE_FRAMES steps
+ARTEFACT_SAFE_TRIES = 16
+ARTEFACT_SAFE_FRAMES = 180
+
+# Rendered text Surfaces kept for the menu, HUD and game over screen (LRU)
+HUD_TEXT_CACHE_SIZE = 64
@@ -1,14 +1,27 @@
-import pygame
+from assets import load_sound
+
+SOUND_FILES = {
+    "collect": "assets/audio/collect.wav",
+    "dash": "assets/audio/dash.wav",
+    "gameover": "assets/audio/gameover.wav",
+    "attack": "assets/audio/attack.wav",
+}
+SOUND_NAMES = tuple(SOUND_FILES)
+
+
+class SilentSound:
+    """Stands in for a pygame Sound when SFX are off or there is no mixer."""
+
+    def play(self, *args, **kwargs):
+        return None
+
+
+SILENT = SilentSound()
+
+
+def silent_sounds():
+    return {name: SILENT for name in SOUND_NAMES}
+
 
 def load_sounds():
-    collect_sound = pygame.mixer.Sound("assets/audio/collect.wav")
-    dash_sound = pygame.mixer.Sound("assets/audio/dash.wav")
-    gameover_sound = pygame.mixer.Sound("assets/audio/gameover.wav")
-    attack_sound = pygame.mixer.Sound("assets/audio/attack.wav")
-    
-    return {
-        "collect": collect_sound,
-        "dash": dash_sound,
-        "gameover": gameover_sound,
-        "attack": attack_sound
-    }
+    return {name: load_sound(path) for name, path in SOUND_FILES.items()}
@@ -0,0 +1,162 @@
+import numpy as np
+from settings import TILE_SIZE
+
+LINEAR_SCAN_ITEMS = 512  # Up to this many items nearest() measures them all at once instead of walking rings
+MAX_WALK_RINGS = 4  # Rings walked before nearest() gives up on the walk and scans everything
+
+
+class SpatialHash:
+    """Uniform grid over echo positions, one bucket per TILE_SIZE cell.
+
+    Items are identified by their index in the caller's echo list, so query
+    results can break ties on index exactly like a linear scan would.
+    sync() keeps the grid current as echoes move, re-bucketing only those
+    that changed cell, and remove() follows an echo being taken out.
+    Positions are kept both as lists for the ring walk and as float arrays
+    for the vectorised scan nearest() uses on small grids.
+    """
+
+    def __init__(self, cell_size=TILE_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.xs = []
+        self.ys = []
+        self.x_array = np.zeros(0)
+        self.y_array = np.zeros(0)
+        self.cell_xs = np.zeros(0, dtype=np.int64)
+        self.cell_ys = np.zeros(0, dtype=np.int64)
+        self.min_cell = (0, 0)
+        self.max_cell = (-1, -1)
+
+    def cell_of(self, x, y):
+        # Rects truncate their coordinates, bucket on the same integers
+        return int(x) // self.cell_size, int(y) // self.cell_size
+
+    def _cells_of(self, xs, ys):
+        # Vector version of cell_of; astype truncates like int()
+        return xs.astype(np.int64) // self.cell_size, ys.astype(np.int64) // self.cell_size
+
+    def _insert(self, i, cell):
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            self.cells[cell] = [i]
+        else:
+            bucket.append(i)
+
+    def _discard(self, i, cell):
+        bucket = self.cells[cell]
+        bucket.remove(i)
+        if not bucket:
+            del self.cells[cell]
+
+    def _update_bounds(self):
+        if self.cells:
+            self.min_cell = (int(self.cell_xs.min()), int(self.cell_ys.min()))
+            self.max_cell = (int(self.cell_xs.max()), int(self.cell_ys.max()))
+        else:
+            self.min_cell = (0, 0)
+            self.max_cell = (-1, -1)
+
+    def rebuild(self, xs, ys):
+        """Buckets every item from scratch; xs and ys are NumPy arrays."""
+        self.cells = {}
+        self.cell_xs, self.cell_ys = self._cells_of(xs, ys)
+        for i, cell in enumerate(zip(self.cell_xs.tolist(), self.cell_ys.tolist())):
+            self._insert(i, cell)
+        self._set_positions(xs, ys)
+        self._update_bounds()
+
+    def sync(self, xs, ys):
+        """Moves the grid to new positions for the same items, plus any appended at the end."""
+        known = len(self.cell_xs)
+        if len(xs) < known:
+            return self.rebuild(xs, ys)
+        cell_xs, cell_ys = self._cells_of(xs, ys)
+        moved = np.flatnonzero((cell_xs[:known] != self.cell_xs) | (cell_ys[:known] != self.cell_ys))
+        for i, old_x, old_y, new_x, new_y in zip(moved.tolist(), self.cell_xs[moved].tolist(),
+                                                 self.cell_ys[moved].tolist(), cell_xs[moved].tolist(),
+                                                 cell_ys[moved].tolist()):
+            self._discard(i, (old_x, old_y))
+            self._insert(i, (new_x, new_y))
+        for i in range(known, len(xs)):
+            self._insert(i, (int(cell_xs[i]), int(cell_ys[i])))
+        self.cell_xs = cell_xs
+        self.cell_ys = cell_ys
+        self._set_positions(xs, ys)
+        self._update_bounds()
+
+    def _set_positions(self, xs, ys):
+        self.xs = xs.tolist()
+        self.ys = ys.tolist()
+        self.x_array = xs.astype(np.float64)
+        self.y_array = ys.astype(np.float64)
+
+    def remove(self, i):
+        """Drops item i; later items shift down one index, like the echo list."""
+        self._discard(i, (int(self.cell_xs[i]), int(self.cell_ys[i])))
+        for bucket in self.cells.values():
+            for j, k in enumerate(bucket):
+                if k > i:
+                    bucket[j] = k - 1
+        self.cell_xs = np.delete(self.cell_xs, i)
+        self.cell_ys = np.delete(self.cell_ys, i)
+        del self.xs[i]
+        del self.ys[i]
+        self.x_array = np.delete(self.x_array, i)
+        self.y_array = np.delete(self.y_array, i)
+        self._update_bounds()
+
+    def nearest(self, pos, exclude=()):
+        """Index of the item closest to pos (lowest index on ties) not in exclude, or None.
+
+        Rings of cells are walked outwards from pos until the best item so
+        far is nearer than anything further out could be, or every item has
+        been seen. Small grids, and walks that run past MAX_WALK_RINGS with
+        sparse items, use one vectorised scan over every item instead.
+        """
+        count = len(self.xs)
+        if not count:
+            return None
+        if count <= LINEAR_SCAN_ITEMS:
+            return self._nearest_scan(pos, exclude)
+        cx = int(pos[0] // self.cell_size)
+        cy = int(pos[1] // self.cell_size)
+        min_cx, min_cy = self.min_cell
+        max_cx, max_cy = self.max_cell
+        max_ring = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy, 0)
+        xs, ys = self.xs, self.ys
+        best = None
+        best_dist = float("inf")
+        seen = 0
+        for ring in range(max_ring + 1):
+            if ring > MAX_WALK_RINGS:
+                return self._nearest_scan(pos, exclude)
+            for gx in range(cx - ring, cx + ring + 1):
+                edge = gx == cx - ring or gx == cx + ring
+                step = 1 if edge else 2 * ring
+                for gy in range(cy - ring, cy + ring + 1, step or 1):
+                    bucket = self.cells.get((gx, gy))
+                    if not bucket:
+                        continue
+                    seen += len(bucket)
+                    for i in bucket:
+                        if i in exclude:
+                            continue
+                        dist = pos.distance_to((xs[i], ys[i]))
+                        if dist < best_dist or (dist == best_dist and i < best):
+                            best_dist = dist
+                            best = i
+            # Anything outside this ring is more than ring * cell_size away
+            if best is not None and best_dist <= ring * self.cell_size or seen == count:
+                break
+        return best
+
+    def _nearest_scan(self, pos, exclude):
+        # Same arithmetic as Vector2.distance_to, so results match the ring walk exactly
+        dx = self.x_array - pos[0]
+        dy = self.y_array - pos[1]
+        dist = np.sqrt(dx * dx + dy * dy)
+        if exclude:
+            dist[list(exclude)] = np.inf
+        best = int(dist.argmin())  # First of equal minima, the lowest index
+        return best if dist[best] < np.inf else None
@@ -0,0 +1,157 @@
+"""Parameter sweeps over headless sessions, one config per pool task.
+
+    python sweep.py --grid player_speed=2.5,3 --grid dash_cooldown=120,180 --seeds 8
+    python sweep.py --table sweep.jsonl
+
+Every combination of the --grid values is played on --seeds seeded runs by
+the scripted bot. Results are appended to --out as one JSON line per config
+as soon as it finishes, so an interrupted sweep picks up where it stopped
+when rerun with the same arguments.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+from game import GameSession, DEFAULT_TUNING, tuning_with
+from headless import simulate, bot_inputs, BOTS
+
+
+def parse_value(text):
+    """Grid values are ints where they can be, floats otherwise."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_grid(specs):
+    """name=v1,v2 strings -> ordered list of (name, values)."""
+    grid = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in DEFAULT_TUNING:
+            raise SystemExit(f"unknown tuning value {name!r}, expected one of: {', '.join(DEFAULT_TUNING)}")
+        if not values:
+            raise SystemExit(f"--grid {spec!r} has no values")
+        grid.append((name, [parse_value(v) for v in values.split(",")]))
+    return grid
+
+
+def grid_configs(grid):
+    names = [name for name, _ in grid]
+    for values in itertools.product(*(values for _, values in grid)):
+        yield dict(zip(names, values))
+
+
+def config_key(overrides, seeds, frames, bot):
+    """Identifies a finished task in the output file."""
+    return json.dumps({"overrides": overrides, "seeds": seeds, "frames": frames, "bot": bot}, sort_keys=True)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_config(task):
+    """Pool worker: plays every seed for one config and returns its result row."""
+    overrides, seeds, frames, bot = task
+    tuning = tuning_with(overrides)
+    runs = []
+    step_times = []
+    for seed in seeds:
+        result = simulate(seed, bot_inputs(bot, seed), frames, session=GameSession(seed, tuning=tuning),
+                          step_times=step_times)
+        runs.append({key: result[key] for key in ("seed", "frames", "round_number", "echoes", "kills", "game_over")})
+    rounds = [run["round_number"] for run in runs]
+    return {
+        "key": config_key(overrides, seeds, frames, bot),
+        "overrides": overrides,
+        "rounds_mean": statistics.fmean(rounds),
+        "rounds_min": min(rounds),
+        "echoes_mean": statistics.fmean(run["echoes"] for run in runs),
+        "kills_mean": statistics.fmean(run["kills"] for run in runs),
+        "frames_mean": statistics.fmean(run["frames"] for run in runs),
+        "game_over_rate": sum(run["game_over"] for run in runs) / len(runs),
+        "step_ms_p50": percentile(step_times, 0.50),
+        "step_ms_p95": percentile(step_times, 0.95),
+        "step_ms_max": max(step_times, default=0.0),
+        "runs": runs,
+    }
+
+
+def load_results(path):
+    """Rows already in the output file; a line cut off by an interrupt is dropped."""
+    rows = []
+    if not os.path.exists(path):
+        return rows
+    with open(path) as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return rows
+
+
+def format_table(rows, names):
+    """Plain text table, best surviving configs first."""
+    columns = list(names) + ["rounds", "min", "echoes", "kills", "frames", "over%", "p50 ms", "p95 ms", "max ms"]
+    lines = []
+    for row in sorted(rows, key=lambda r: (-r["rounds_mean"], -r["rounds_min"])):
+        cells = [str(row["overrides"].get(name, DEFAULT_TUNING[name])) for name in names]
+        cells += [f"{row['rounds_mean']:.1f}", str(row["rounds_min"]), f"{row['echoes_mean']:.1f}",
+                  f"{row['kills_mean']:.1f}", f"{row['frames_mean']:.0f}", f"{row['game_over_rate'] * 100:.0f}",
+                  f"{row['step_ms_p50']:.3f}", f"{row['step_ms_p95']:.3f}", f"{row['step_ms_max']:.3f}"]
+        lines.append(cells)
+    widths = [max(len(column), *(len(cells[i]) for cells in lines)) for i, column in enumerate(columns)]
+    out = ["  ".join(column.rjust(width) for column, width in zip(columns, widths))]
+    out += ["  ".join(cell.rjust(width) for cell, width in zip(cells, widths)) for cells in lines]
+    return "\n".join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep Echo Dash tuning values over headless runs")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help=f"Values to try for one tuning name (repeatable): {', '.join(DEFAULT_TUNING)}")
+    parser.add_argument("--seeds", type=int, default=8, help="Seeded runs per config, seeds 0..N-1")
+    parser.add_argument("--frames", type=int, default=60 * 60 * 10, help="Frame cap per run")
+    parser.add_argument("--bot", choices=BOTS, default="seek", help="Scripted player, see headless.py")
+    parser.add_argument("--out", default="sweep.jsonl", help="JSON lines file, appended to and resumed from")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Pool size (default: every core)")
+    parser.add_argument("--table", metavar="PATH", help="Only print the table for an existing results file")
+    args = parser.parse_args()
+
+    if args.table:
+        rows = load_results(args.table)
+        names = sorted({name for row in rows for name in row["overrides"]})
+        print(format_table(rows, names))
+        return
+
+    grid = parse_grid(args.grid)
+    names = [name for name, _ in grid]
+    seeds = list(range(args.seeds))
+    tasks = [(overrides, seeds, args.frames, args.bot) for overrides in grid_configs(grid)]
+    done = {row["key"]: row for row in load_results(args.out)}
+    pending = [task for task in tasks if config_key(*task) not in done]
+    print(f"{len(tasks)} configs, {len(tasks) - len(pending)} already in {args.out}, "
+          f"running {len(pending)} on {args.workers} workers", file=sys.stderr)
+
+    if pending:
+        with open(args.out, "a") as out, multiprocessing.Pool(args.workers) as pool:
+            for row in pool.imap_unordered(run_config, pending):
+                out.write(json.dumps(row) + "\n")
+                out.flush()
+                done[row["key"]] = row
+                print(f"  {row['overrides']}: {row['rounds_mean']:.1f} rounds", file=sys.stderr)
+
+    print(format_table([done[config_key(*task)] for task in tasks], names))
+
+
+if __name__ == "__main__":
+    main()
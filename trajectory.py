@@ -0,0 +1,74 @@
+from array import array
+
+INITIAL_CAPACITY = 256  # Frames, grows by doubling
+
+
+class Trajectory:
+    """Recorded (x, y) positions packed into a single float32 buffer.
+
+    Echoes walk the recording forwards and then backwards, so instead of
+    storing a reversed copy the loop is resolved by index: frame k of the
+    ping-pong loop maps to sample k on the way out and 2n - 1 - k on the way
+    back.
+    """
+
+    __slots__ = ("_buf", "_count")
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._buf = array("f", bytes(8 * max(1, capacity)))
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getstate__(self):
+        # Pickle just the recorded samples, not the spare capacity
+        return self._count, self._buf[:2 * self._count].tobytes()
+
+    def __setstate__(self, state):
+        self._count, samples = state
+        self._buf = array("f")
+        self._buf.frombytes(samples)
+        if not self._buf:
+            self._buf.extend((0.0, 0.0))
+
+    @property
+    def loop_length(self):
+        return 2 * self._count
+
+    def append(self, pos):
+        i = 2 * self._count
+        buf = self._buf
+        if i + 2 > len(buf):
+            # Double in place so appends stay amortised O(1)
+            buf.extend(array("f", bytes(4 * len(buf))))
+        buf[i] = pos[0]
+        buf[i + 1] = pos[1]
+        self._count += 1
+
+    def loop_index(self, frame):
+        n = self._count
+        k = frame % (2 * n)
+        return k if k < n else 2 * n - 1 - k
+
+    def x_at(self, frame):
+        return self._buf[2 * self.loop_index(frame)]
+
+    def y_at(self, frame):
+        return self._buf[2 * self.loop_index(frame) + 1]
+
+    def xy_at(self, frame):
+        i = 2 * self.loop_index(frame)
+        return self._buf[i], self._buf[i + 1]
+
+    def last(self):
+        """The newest sample as stored, i.e. rounded to float32."""
+        i = 2 * self._count - 2
+        return self._buf[i], self._buf[i + 1]
+
+    def samples(self):
+        """Memoryview over the used part of the buffer (x0, y0, x1, y1, ...)."""
+        return memoryview(self._buf)[:2 * self._count]
+
+    def nbytes(self):
+        return self._buf.itemsize * len(self._buf)
@@ -2,10 +2,37 @@ import random
 import pygame
 from settings import WIDTH, HEIGHT, TILE_SIZE
 
-def random_artefact_position(artefact_pos):
+def random_artefact_position(artefact_pos, rng=None):
+    # Pass a seeded random.Random for reproducible runs
+    rng = rng or random
     while True:
-        grid_x = random.randint(1, (WIDTH - TILE_SIZE) // TILE_SIZE - 1)
-        grid_y = random.randint(1, (HEIGHT - TILE_SIZE) // TILE_SIZE - 1)
+        grid_x = rng.randint(1, (WIDTH - TILE_SIZE) // TILE_SIZE - 1)
+        grid_y = rng.randint(1, (HEIGHT - TILE_SIZE) // TILE_SIZE - 1)
         new_pos = pygame.Vector2(grid_x * TILE_SIZE, grid_y * TILE_SIZE)
         if new_pos.distance_to(artefact_pos) > 3 * TILE_SIZE:
             return new_pos
+
+class SimState:
+    """get_state()/set_state() over the attributes named in STATE_FIELDS.
+
+    A subclass lists everything the simulation needs to resume there.
+    get_state() shares live objects, so pickle it before stepping again.
+    """
+
+    STATE_FIELDS = ()
+
+    def get_state(self):
+        return {name: getattr(self, name) for name in self.STATE_FIELDS}
+
+    def set_state(self, state):
+        for name in self.STATE_FIELDS:
+            setattr(self, name, state[name])
+
+def move_rect(rect, x, y):
+    """Moves a scratch rect to (x, y), truncating like pygame.Rect(x, y, ...) does.
+
+    Rect attribute setters round floats instead, which would change collisions.
+    """
+    rect.x = int(x)
+    rect.y = int(y)
+    return rect